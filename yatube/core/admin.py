@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'priority', 'attempts', 'run_at',
+        'finished_at', 'created',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    empty_value_display = '-пусто-'
@@ -0,0 +1,450 @@
+"""Двухуровневый кэш: LRU в памяти процесса (L1) перед общим хранилищем (L2).
+
+L2 — другой настроенный кэш, его alias указывается в LOCATION. Каждая
+запись в L2 попадает в журнал инвалидаций там же; процессы не чаще раза
+в SYNC_INTERVAL секунд читают журнал и выбрасывают из своего L1
+изменённые ключи. Если журнал потерян или процесс отстал больше чем на
+JOURNAL_LENGTH записей, L1 очищается целиком. L1_TIMEOUT ограничивает
+устаревание копии, если оповещение всё же не дошло.
+
+Номер записи журнала выдаёт l2.incr, на add и incr L2 держатся
+блокировки и счётчики проекта, поэтому L2 обязан делать их атомарно:
+годится memcached, redis или DatabaseCache ниже, но не файловый кэш и
+не django.core.cache.backends.db (ATOMIC_BACKENDS).
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 30},
+        },
+        'shared': {...},
+    }
+"""
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import CacheEntry
+
+# Служебные ключи журнала в L2
+SEQ_KEY = 'tiered:seq'
+JOURNAL_LENGTH = 1000
+# Параметры L1 по умолчанию
+L1_MAX_ENTRIES = 1000
+L1_TIMEOUT = 30
+SYNC_INTERVAL = 1
+
+# L2, у которых add и incr атомарны; LocMemCache — только в пределах
+# одного процесса, то есть для тестов
+ATOMIC_BACKENDS = (
+    'core.cache.DatabaseCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.memcached.MemcachedCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+)
+# Доля записей DatabaseCache, после которых удаляются истёкшие строки
+CULL_PROBABILITY = 0.01
+
+_MISSING = object()
+
+
+def journal_key(seq):
+    return f'tiered:inv:{seq % JOURNAL_LENGTH}'
+
+
+class LocalTier:
+    """L1 одного процесса: LRU с TTL и счётчики обоих уровней."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.seen = None
+        self.next_sync = 0
+        self.counters = dict.fromkeys((
+            'l1_hits', 'l1_misses', 'l2_hits', 'l2_misses',
+            'sent', 'received', 'flushes',
+        ), 0)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self.entries.pop(key, None)
+                self.counters['l1_misses'] += 1
+                return _MISSING
+            self.entries.move_to_end(key)
+            self.counters['l1_hits'] += 1
+        return pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=None):
+        if timeout is not None and timeout <= 0:
+            self.drop([key])
+            return
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (pickled, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def drop(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+
+# L1 общий для всех потоков процесса, как у LocMemCache
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        backend = settings.CACHES.get(location, {}).get('BACKEND')
+        if backend not in ATOMIC_BACKENDS:
+            raise ImproperlyConfigured(
+                f'L2 TieredCache ({location}: {backend}) должен атомарно '
+                f'выполнять add и incr, см. core.cache.ATOMIC_BACKENDS'
+            )
+        self.l2_alias = location
+        self.sync_interval = options.get('SYNC_INTERVAL', SYNC_INTERVAL)
+        with _tiers_lock:
+            self.local = _tiers.setdefault(location, LocalTier(
+                options.get('L1_MAX_ENTRIES', L1_MAX_ENTRIES),
+                options.get('L1_TIMEOUT', L1_TIMEOUT),
+            ))
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def local_key(self, key, version=None):
+        return self.l2.make_key(key, version=version)
+
+    def l2_timeout(self, timeout):
+        # None и DEFAULT_TIMEOUT L2 понимает сам
+        if timeout is DEFAULT_TIMEOUT:
+            return self.l2.default_timeout
+        return timeout
+
+    def sync(self):
+        """Выбрасывает из L1 ключи, изменённые другими процессами."""
+        local = self.local
+        now = time.monotonic()
+        if now < local.next_sync:
+            return
+        local.next_sync = now + self.sync_interval
+        seq = self.l2.get(SEQ_KEY)
+        seen = local.seen
+        if seq == seen:
+            return
+        local.seen = seq
+        lagging = seen is None or seq is None or not (
+            0 < seq - seen <= JOURNAL_LENGTH
+        )
+        if lagging:
+            local.clear()
+            local.count('flushes')
+            return
+        wanted = range(seen + 1, seq + 1)
+        journal = self.l2.get_many([journal_key(n) for n in wanted])
+        stale = []
+        for n in wanted:
+            entry = journal.get(journal_key(n))
+            if entry is None or entry[0] != n:
+                # Запись журнала перезаписана или вытеснена
+                local.clear()
+                local.count('flushes')
+                return
+            stale.extend(entry[1])
+        local.drop(stale)
+        local.count('received', len(wanted))
+
+    def broadcast(self, keys):
+        """Сообщает остальным процессам об изменении ключей."""
+        try:
+            seq = self.l2.incr(SEQ_KEY)
+        except ValueError:
+            self.l2.add(SEQ_KEY, 0, None)
+            seq = self.l2.incr(SEQ_KEY)
+        self.l2.set(journal_key(seq), (seq, list(keys)), None)
+        if self.local.seen == seq - 1:
+            # Между нашими записями никто не писал: свою не перечитываем
+            self.local.seen = seq
+        self.local.count('sent')
+
+    def get(self, key, default=None, version=None):
+        self.sync()
+        local_key = self.local_key(key, version)
+        value = self.local.get(local_key)
+        if value is not _MISSING:
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.local.count('l2_misses')
+            return default
+        self.local.count('l2_hits')
+        self.local.set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self.sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(self.local_key(key, version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.l2.get_many(missing, version=version)
+            self.local.count('l2_hits', len(fetched))
+            self.local.count('l2_misses', len(missing) - len(fetched))
+            for key, value in fetched.items():
+                self.local.set(self.local_key(key, version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        local_key = self.local_key(key, version)
+        self.broadcast([local_key])
+        self.local.set(local_key, value, self.l2_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        local_key = self.local_key(key, version)
+        self.broadcast([local_key])
+        self.local.set(local_key, value, self.l2_timeout(timeout))
+        return True
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        local_keys = [self.local_key(key, version) for key in data]
+        self.broadcast(local_keys)
+        for key, value in data.items():
+            if key not in failed:
+                self.local.set(
+                    self.local_key(key, version), value,
+                    self.l2_timeout(timeout)
+                )
+        return failed
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        local_key = self.local_key(key, version)
+        self.broadcast([local_key])
+        self.local.set(local_key, value)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version=version)
+        local_key = self.local_key(key, version)
+        self.local.drop([local_key])
+        self.broadcast([local_key])
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return
+        self.l2.delete_many(keys, version=version)
+        local_keys = [self.local_key(key, version) for key in keys]
+        self.local.drop(local_keys)
+        self.broadcast(local_keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        # Журнал в L2 пропадает вместе с данными: остальные процессы
+        # увидят пропавший SEQ_KEY и очистят свой L1
+        self.l2.clear()
+        self.local.clear()
+        self.local.seen = None
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def stats(self):
+        """Попадания и промахи по уровням в текущем процессе."""
+        counters = dict(self.local.counters)
+        return {
+            'l1': {
+                'hits': counters['l1_hits'],
+                'misses': counters['l1_misses'],
+                'size': len(self.local.entries),
+            },
+            'l2': {
+                'hits': counters['l2_hits'],
+                'misses': counters['l2_misses'],
+            },
+            'invalidations': {
+                'sent': counters['sent'],
+                'received': counters['received'],
+                'flushes': counters['flushes'],
+            },
+        }
+
+
+class DatabaseCache(BaseCache):
+    """Общий кэш в таблице core.CacheEntry с атомарными add и incr.
+
+    add опирается на первичный ключ: из одновременных вставок пройдёт
+    одна. incr — UPDATE с F() и чтение результата в той же транзакции,
+    поэтому каждый вызов получает своё значение. Истёкшие строки
+    удаляются изредка при записи (CULL_PROBABILITY). Таблица — в базе,
+    которую ей отводит core.routers.CacheRouter.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.db = router.db_for_write(CacheEntry)
+
+    def expiry(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return None
+        return datetime.fromtimestamp(timeout, tz=timezone.utc)
+
+    def alive(self):
+        return CacheEntry.objects.filter(
+            Q(expires__isnull=True) | Q(expires__gt=timezone.now())
+        )
+
+    def encode(self, value, timeout):
+        if type(value) is int:
+            fields = {'value': None, 'number': value}
+        else:
+            fields = {
+                'value': pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                'number': None,
+            }
+        fields['expires'] = self.expiry(timeout)
+        return fields
+
+    def decode(self, value, number):
+        if value is None:
+            return number
+        return pickle.loads(bytes(value))
+
+    def key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def cull(self):
+        if random.random() < CULL_PROBABILITY:
+            CacheEntry.objects.filter(expires__lte=timezone.now()).delete()
+
+    def get(self, key, default=None, version=None):
+        row = self.alive().filter(key=self.key(key, version)).values_list(
+            'value', 'number'
+        ).first()
+        if row is None:
+            return default
+        return self.decode(*row)
+
+    def get_many(self, keys, version=None):
+        keys = {self.key(key, version): key for key in keys}
+        rows = self.alive().filter(key__in=keys).values_list(
+            'key', 'value', 'number'
+        )
+        return {
+            keys[key]: self.decode(value, number)
+            for key, value, number in rows
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        fields = self.encode(value, timeout)
+        if not CacheEntry.objects.filter(key=key).update(**fields):
+            try:
+                with transaction.atomic(using=self.db):
+                    CacheEntry.objects.create(key=key, **fields)
+            except IntegrityError:
+                # Строку успел вставить другой процесс — перезаписываем
+                CacheEntry.objects.filter(key=key).update(**fields)
+        self.cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        CacheEntry.objects.filter(
+            key=key, expires__lte=timezone.now()
+        ).delete()
+        try:
+            with transaction.atomic(using=self.db):
+                CacheEntry.objects.create(
+                    key=key, **self.encode(value, timeout)
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.key(key, version)
+        with transaction.atomic(using=self.db):
+            # Строка заблокирована до конца транзакции: прочитанное
+            # значение — результат именно этого UPDATE
+            if not self.alive().filter(
+                key=key, number__isnull=False
+            ).update(number=F('number') + delta):
+                raise ValueError(f'Key {key!r} not found')
+            return CacheEntry.objects.values_list(
+                'number', flat=True
+            ).get(key=key)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self.alive().filter(key=self.key(key, version)).update(
+            expires=self.expiry(timeout)
+        ))
+
+    def delete(self, key, version=None):
+        CacheEntry.objects.filter(key=self.key(key, version)).delete()
+
+    def delete_many(self, keys, version=None):
+        CacheEntry.objects.filter(
+            key__in=[self.key(key, version) for key in keys]
+        ).delete()
+
+    def has_key(self, key, version=None):
+        return self.alive().filter(key=self.key(key, version)).exists()
+
+    def clear(self):
+        CacheEntry.objects.all().delete()
@@ -0,0 +1,224 @@
+"""Очередь фоновых задач в базе данных.
+
+Задача — обычная функция, помеченная @job. Вызов func.delay(...)
+ставит её в очередь, когда закоммитится текущая транзакция, а
+manage.py runworker выполняет: сначала более приоритетные, упавшие —
+повторяет с растущей паузой. Раз в MAINTENANCE_INTERVAL обработчики
+возвращают задачи зависших собратьев и удаляют старые завершённые.
+С JOBS_EAGER (в тестах) задача выполняется сразу на месте, а если
+она упала — повторы ставятся в очередь. after_commit() так же
+откладывает до коммита сбросы кэша и прочее вне базы.
+
+Аргументы задач должны сериализоваться в JSON: передавайте id, а не
+экземпляры моделей.
+"""
+import json
+import random
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+PRIORITY_HIGH = 10
+PRIORITY_DEFAULT = 0
+PRIORITY_LOW = -10
+MAX_ATTEMPTS = 5
+# Пауза перед повтором: BACKOFF_BASE * 2 ** (попытка - 1), не больше MAX
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+# Задача, взятая обработчиком, который с тех пор молчит, возвращается
+LOCK_TIMEOUT = 60 * 10
+# Как часто обработчик делает maintain()
+MAINTENANCE_INTERVAL = 60
+# Сколько кандидатов смотрим за один заход, пока не захватим задачу
+CLAIM_BATCH = 10
+# Сколько хранятся завершённые задачи: выполненные и проваленные
+DONE_RETENTION = 60 * 60 * 24
+FAILED_RETENTION = 60 * 60 * 24 * 30
+# Сколько строк удаляем одним запросом, чтобы не держать таблицу
+PURGE_BATCH = 1000
+
+JOBS = {}
+
+
+def job(priority=PRIORITY_DEFAULT, max_attempts=MAX_ATTEMPTS):
+    """Регистрирует функцию как задачу и добавляет ей .delay()."""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+        JOBS[name] = func
+        func.job_name = name
+        func.job_options = {
+            'priority': priority, 'max_attempts': max_attempts
+        }
+        func.delay = partial(enqueue, name)
+        return func
+    return decorator
+
+
+def create_job(name, args=(), kwargs=None, priority=None,
+               max_attempts=None, delay=0):
+    """Кладёт задачу в таблицу; по умолчанию — с параметрами из @job."""
+    options = getattr(JOBS.get(name), 'job_options', {})
+    if priority is None:
+        priority = options.get('priority', PRIORITY_DEFAULT)
+    if max_attempts is None:
+        max_attempts = options.get('max_attempts', MAX_ATTEMPTS)
+    return Job.objects.create(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue(name, *args, priority=None, max_attempts=None, delay=0,
+            **kwargs):
+    """Ставит задачу в очередь после коммита текущей транзакции.
+
+    Обработчик не увидит задачу раньше, чем данные, ради которых она
+    поставлена; при откате транзакции задачи не будет вовсе.
+    """
+    if getattr(settings, 'JOBS_EAGER', False):
+        try:
+            resolve(name)(*args, **kwargs)
+        except Exception:
+            # Первая попытка — на месте, повторы — в очереди, как у
+            # обработчика
+            job = create_job(name, args, kwargs, priority, max_attempts)
+            job.attempts = 1
+            failed(job)
+            job.save()
+        return
+    transaction.on_commit(partial(
+        create_job, name, args, kwargs, priority, max_attempts, delay
+    ))
+
+
+def after_commit(func, *args, **kwargs):
+    """Вызывает func после коммита текущей транзакции, как enqueue().
+
+    Для побочных эффектов вне базы, например сбросов кэша: до коммита
+    другой процесс успел бы собрать кэш заново из старых данных и
+    хранить его до конца TTL. С JOBS_EAGER вызывает сразу — в TestCase
+    транзакция не коммитится.
+    """
+    if getattr(settings, 'JOBS_EAGER', False):
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(partial(func, *args, **kwargs))
+
+
+def resolve(name):
+    if name not in JOBS:
+        # Модуль с задачей мог ещё не импортироваться в этом процессе
+        import_string(name)
+    return JOBS[name]
+
+
+def backoff(attempts):
+    """Секунды до следующей попытки, с небольшим разбросом."""
+    pause = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return pause + random.uniform(0, pause / 10)
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи зависших обработчиков."""
+    edge = timezone.now() - timedelta(seconds=LOCK_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=edge
+    ).update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def purge_finished():
+    """Удаляет завершённые задачи старше срока хранения; сколько удалено."""
+    now = timezone.now()
+    finished = Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=now - timedelta(seconds=DONE_RETENTION),
+    ) | Job.objects.filter(
+        status=Job.FAILED,
+        finished_at__lt=now - timedelta(seconds=FAILED_RETENTION),
+    )
+    purged = 0
+    while True:
+        batch = list(finished.values_list('pk', flat=True)[:PURGE_BATCH])
+        if not batch:
+            return purged
+        purged += Job.objects.filter(pk__in=batch).delete()[0]
+
+
+def maintain():
+    """Обслуживание очереди, которое обработчики делают по расписанию."""
+    requeue_stale()
+    purge_finished()
+
+
+def claim(worker):
+    """Захватывает готовую задачу для обработчика worker.
+
+    SQLite не умеет SELECT ... FOR UPDATE SKIP LOCKED, поэтому задача
+    захватывается условным UPDATE: кто первым сменил статус, тот и
+    выполняет.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('-priority', 'run_at', 'pk').values_list(
+        'pk', flat=True
+    )[:CLAIM_BATCH]
+    for pk in candidates:
+        taken = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now
+        )
+        if taken:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def failed(job):
+    """Отмечает упавшую попытку: повтор с паузой или провал."""
+    job.last_error = traceback.format_exc()
+    if job.attempts >= job.max_attempts:
+        job.status = Job.FAILED
+        job.finished_at = timezone.now()
+    else:
+        job.status = Job.QUEUED
+        job.run_at = timezone.now() + timedelta(
+            seconds=backoff(job.attempts)
+        )
+
+
+def perform(job):
+    """Выполняет задачу; при ошибке планирует повтор или сдаётся."""
+    job.attempts += 1
+    payload = json.loads(job.payload)
+    try:
+        resolve(job.name)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        failed(job)
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=[
+        'attempts', 'last_error', 'status', 'run_at', 'locked_by',
+        'locked_at', 'finished_at',
+    ])
+    return job.status == Job.DONE
+
+
+def run_next(worker):
+    """Выполняет одну задачу; None, если очередь пуста."""
+    job = claim(worker)
+    if job is None:
+        return None
+    perform(job)
+    return job
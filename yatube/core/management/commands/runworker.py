@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from core.jobs import MAINTENANCE_INTERVAL, maintain, run_next
+
+POLL_INTERVAL = 1.0
+
+
+def work(name, once, poll, stop):
+    """Цикл одного обработчика: берёт задачи, пока не велят остановиться."""
+    next_maintenance = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            # Не только при старте: иначе задачу упавшего соседа никто
+            # не вернёт до следующего перезапуска
+            if time.monotonic() >= next_maintenance:
+                maintain()
+                next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+            if run_next(name) is not None:
+                continue
+            if once:
+                break
+            stop.wait(poll)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди core.Job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Сколько обработчиков запустить.'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Обработчики — процессы, а не потоки.'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать готовые задачи и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        if options['processes']:
+            # Соединения с БД не должны переходить в дочерние процессы
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            make = context.Process
+        else:
+            stop = threading.Event()
+            make = threading.Thread
+        workers = [
+            make(target=work, args=(
+                f'{prefix}:{number}', options['once'], options['poll'], stop
+            ))
+            for number in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Обработчиков запущено: {len(workers)}')
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS('Обработчики остановлены'))
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('name', models.CharField(max_length=200, verbose_name='Задача')),
+                ('payload', models.TextField(default='{}', verbose_name='Аргументы')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Приоритет')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Провалена')], default='queued', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Предел попыток')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запустить не раньше')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Обработчик')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', '-priority', 'run_at'], name='job_queue_idx'),
+        ),
+    ]
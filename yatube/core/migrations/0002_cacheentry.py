@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=250, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('value', models.BinaryField(null=True, verbose_name='Значение')),
+                ('number', models.BigIntegerField(null=True, verbose_name='Число')),
+                ('expires', models.DateTimeField(db_index=True, null=True, verbose_name='Истекает')),
+            ],
+            options={
+                'verbose_name': 'Запись кэша',
+                'verbose_name_plural': 'Записи кэша',
+            },
+        ),
+    ]
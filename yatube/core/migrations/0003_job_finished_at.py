@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_cacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Завершена'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -11,3 +12,63 @@ class CreatedModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+class Job(CreatedModel):
+    """Отложенная задача для manage.py runworker."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Провалена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    # JSON: {"args": [...], "kwargs": {...}}
+    payload = models.TextField('Аргументы', default='{}')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Предел попыток', default=5
+    )
+    run_at = models.DateTimeField('Запустить не раньше', default=timezone.now)
+    locked_by = models.CharField('Обработчик', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    finished_at = models.DateTimeField(
+        'Завершена', null=True, blank=True, db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        # Выборка очереди: готовые к запуску по приоритету
+        indexes = [
+            models.Index(
+                fields=['status', '-priority', 'run_at'],
+                name='job_queue_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} [{self.status}]'
+
+
+class CacheEntry(models.Model):
+    """Запись общего кэша (core.cache.DatabaseCache)."""
+    key = models.CharField('Ключ', max_length=250, primary_key=True)
+    value = models.BinaryField('Значение', null=True)
+    # Целые хранятся числом: incr — атомарный UPDATE number = number + d
+    number = models.BigIntegerField('Число', null=True)
+    expires = models.DateTimeField('Истекает', null=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Запись кэша'
+        verbose_name_plural = 'Записи кэша'
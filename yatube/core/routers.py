@@ -0,0 +1,27 @@
+"""Роутер баз данных: таблица общего кэша живёт в своей базе.
+
+Запросы DatabaseCache не попадают в транзакции приложения и сразу
+видны другим процессам, а заполнение кэша при чтении страниц не
+занимает блокировку записи основной базы SQLite. Таблицу создаёт
+
+    python manage.py migrate --database=cache
+"""
+CACHE_DATABASE = 'cache'
+
+
+class CacheRouter:
+    """core.CacheEntry — в базе CACHE_DATABASE, остальное — не в ней."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label == 'core.CacheEntry':
+            return CACHE_DATABASE
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'core' and model_name == 'cacheentry':
+            return db == CACHE_DATABASE
+        if db == CACHE_DATABASE:
+            return False
+        return None
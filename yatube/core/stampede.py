@@ -0,0 +1,96 @@
+"""Защита от лавины пересчётов (cache stampede).
+
+remember() хранит значение вместе со временем его вычисления и сроком
+годности. Незадолго до срока запрос с вероятностью, растущей к концу
+срока, берётся пересчитать значение заранее (XFetch). Пересчитывает
+только тот, кто взял блокировку в кэше; остальные получают прежнее
+значение, а если его нет — недолго ждут результата.
+
+Блокировка берётся мимо L1, прямо в L2: там add атомарен (TieredCache
+не запустится с другим L2), и её снятие сразу видно всем процессам.
+"""
+import functools
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+# Насколько охотно пересчитываем заранее; 1 — рекомендованное значение
+BETA = 1.0
+# Сколько держится блокировка, если пересчитывающий упал
+LOCK_TIMEOUT = 30
+# Сколько устаревшее значение ещё лежит в кэше после своего срока
+STALE_TIMEOUT = 60
+# Сколько ждём чужого пересчёта, когда отдать нечего
+WAIT_TIMEOUT = 5
+WAIT_STEP = 0.05
+
+
+def lock_key(key):
+    return f'stampede:lock:{key}'
+
+
+def locks():
+    """Кэш для блокировок: L2 за TieredCache или сам кэш."""
+    return getattr(cache, 'l2', cache)
+
+
+def should_recompute(envelope, beta=BETA):
+    """Пора ли пересчитывать: истёк срок или выпал ранний пересчёт."""
+    if envelope is None:
+        return True
+    _, delta, expires = envelope
+    if expires is None:
+        return False
+    # log(random()) отрицателен: сдвигаем «сейчас» вперёд на случайную
+    # долю времени вычисления
+    return time.time() - delta * beta * math.log(random.random()) >= expires
+
+
+def compute_and_store(key, compute, timeout):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    expires = None if timeout is None else finished + timeout
+    stored = None if timeout is None else timeout + STALE_TIMEOUT
+    cache.set(key, (value, finished - started, expires), stored)
+    return value
+
+
+def remember(key, compute, timeout, beta=BETA):
+    """Значение key из кэша; при промахе compute() вызывает один запрос."""
+    envelope = cache.get(key)
+    if not should_recompute(envelope, beta):
+        return envelope[0]
+    if locks().add(lock_key(key), 1, LOCK_TIMEOUT):
+        try:
+            return compute_and_store(key, compute, timeout)
+        finally:
+            locks().delete(lock_key(key))
+    if envelope is not None:
+        # Пересчитывает другой запрос — пока отдаём прежнее значение
+        return envelope[0]
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope[0]
+        if not locks().get(lock_key(key)):
+            break
+    # Не дождались: считаем сами, чтобы не отдать пустую страницу
+    return compute_and_store(key, compute, timeout)
+
+
+def single_flight(key, timeout, beta=BETA):
+    """Декоратор над remember(); key — строка или функция от аргументов."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            name = key(*args, **kwargs) if callable(key) else key
+            return remember(
+                name, lambda: func(*args, **kwargs), timeout, beta
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,132 @@
+"""Хранилище, где имя файла — хэш его содержимого.
+
+HashedStorage считает SHA-256 прямо при записи загрузки во временный
+файл и кладёт её под именем <каталог>/ab/cd/<хэш>.<расширение>, где
+ab и cd — начало хэша: так ни в одном каталоге не набирается больше
+нескольких сотен файлов. Одинаковые файлы занимают место один раз, и
+у них общие превью. Содержимое по
+такому имени никогда не меняется, поэтому его можно отдавать с
+«вечным» кэшированием (immutable, serve_media).
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail.conf import settings as sorl_settings
+
+# Имя из хэша — и файлы, производные от него (варианты)
+IMMUTABLE_RE = re.compile(r'(^|/)[0-9a-f]{64}[^/]*$')
+# Превью sorl в THUMBNAIL_PREFIX: ab/cd/<md5>.<расширение>, где md5 —
+# от имени исходника и опций, а имена исходников не переиспользуются
+THUMBNAIL_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}\.[^/]+$')
+# Уровни подкаталогов и сколько символов хэша на каждый
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+SHARDED_RE = re.compile(
+    r'(^|/)' + (r'[0-9a-f]{%d}/' % SHARD_WIDTH) * SHARD_DEPTH
+    + r'[0-9a-f]{64}[^/]*$'
+)
+# Права файла, когда FILE_UPLOAD_PERMISSIONS не задан: читают все
+FILE_MODE = 0o644
+
+
+def immutable(name):
+    """Содержимое под этим именем в storage никогда не меняется."""
+    prefix = sorl_settings.THUMBNAIL_PREFIX
+    return bool(IMMUTABLE_RE.search(name) or (
+        name.startswith(prefix) and THUMBNAIL_RE.match(name[len(prefix):])
+    ))
+
+
+def write_temporary(directory, chunks, digest=None):
+    """Пишет куски во временный файл в directory; возвращает его путь.
+
+    Временный файл лежит рядом с целевым, чтобы os.replace был атомарным.
+    """
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.upload')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            for chunk in chunks:
+                if digest is not None:
+                    digest.update(chunk)
+                file.write(chunk)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return temporary
+
+
+def publish(storage, temporary, name):
+    """Атомарно ставит временный файл на место name с правами storage.
+
+    mkstemp создаёт файлы с правами 0600; без FILE_UPLOAD_PERMISSIONS
+    ставим FILE_MODE, как FileSystemStorage при обычном umask, чтобы
+    веб-сервер под другим пользователем мог отдавать файл.
+    """
+    try:
+        os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+        mode = storage.file_permissions_mode
+        os.chmod(temporary, FILE_MODE if mode is None else mode)
+        os.replace(temporary, storage.path(name))
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def save_in_place(storage, name, content):
+    """Пишет content ровно под именем name, заменяя прежний файл.
+
+    storage.save() при занятом имени подобрал бы другое: два
+    одновременных построения одного файла оставили бы копию с
+    суффиксом _abc123. Здесь выигрывает последний, и копий нет.
+    """
+    directory = storage.path(os.path.dirname(name))
+    publish(storage, write_temporary(directory, content.chunks()), name)
+    return name
+
+
+@deconstructible
+class HashedStorage(FileSystemStorage):
+    def hashed_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        shards = [
+            digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+            for level in range(SHARD_DEPTH)
+        ]
+        return os.path.join(directory, *shards, f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        """Сохраняет файл под именем из хэша; дубликат не пишется."""
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.generate_filename(name)
+        digest = hashlib.sha256()
+        temporary = write_temporary(
+            self.path(os.path.dirname(name)), content.chunks(), digest
+        )
+        name = self.hashed_name(name, digest.hexdigest())
+        if self.exists(name):
+            os.remove(temporary)
+            # Повторная загрузка «освежает» файл: gc_media не тронет
+            # молодой файл, даже если считал его сиротой
+            os.utime(self.path(name))
+        else:
+            publish(self, temporary, name)
+        return name.replace('\\', '/')
+
+    def delete(self, name):
+        # Файл может принадлежать нескольким записям: удаляет только
+        # сборщик мусора, который проверяет, что ссылок больше нет
+        pass
+
+    def force_delete(self, name):
+        super().delete(name)
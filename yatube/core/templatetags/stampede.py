@@ -0,0 +1,51 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.template import TemplateSyntaxError, VariableDoesNotExist
+
+from core.stampede import remember
+
+register = template.Library()
+
+
+class SingleFlightCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time_var = expire_time_var
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        try:
+            expire_time = int(self.expire_time_var.resolve(context))
+        except (VariableDoesNotExist, ValueError, TypeError):
+            raise TemplateSyntaxError(
+                f'"cache" tag got a bad timeout: {self.expire_time_var}'
+            )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return remember(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+        )
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """{% cache %} как во встроенной библиотеке, но через remember().
+
+    {% load stampede %}
+    {% cache 600 fragment_name var1 var2 %}...{% endcache %}
+    """
+    nodelist = parser.parse(('endcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return SingleFlightCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
@@ -0,0 +1,149 @@
+import threading
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from ..cache import DatabaseCache, LocalTier, TieredCache
+
+
+def tiered(**options):
+    """Кэш с собственным L1 — как в отдельном процессе."""
+    tier = TieredCache('shared', {'OPTIONS': options})
+    tier.local = LocalTier(
+        options.get('L1_MAX_ENTRIES', 100), options.get('L1_TIMEOUT', 30)
+    )
+    return tier
+
+
+class TieredCacheTest(TestCase):
+    databases = {'default', 'cache'}
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.first = tiered(SYNC_INTERVAL=0)
+        self.second = tiered(SYNC_INTERVAL=0)
+
+    def test_second_read_served_from_l1(self):
+        """Повторное чтение не доходит до L2."""
+        caches['shared'].set('key', 'value')
+        self.assertEqual(self.first.get('key'), 'value')
+        self.assertEqual(self.first.get('key'), 'value')
+        stats = self.first.stats()
+        self.assertEqual(stats['l1']['hits'], 1)
+        self.assertEqual(stats['l2']['hits'], 1)
+
+    def test_write_invalidates_other_process(self):
+        """Запись в одном процессе выбрасывает копию из L1 другого."""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.assertGreater(self.second.stats()['invalidations']['received'], 0)
+
+    def test_clear_flushes_other_process(self):
+        """Очистка L2 сбрасывает L1 остальных процессов."""
+        self.first.set('key', 'value')
+        self.second.get('key')
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читанные ключи."""
+        tier = tiered(L1_MAX_ENTRIES=2)
+        for key in 'abc':
+            tier.set(key, key)
+        self.assertEqual(len(tier.local.entries), 2)
+        self.assertEqual(tier.get('a'), 'a')
+        self.assertEqual(tier.stats()['l2']['hits'], 1)
+
+    @override_settings(CACHES={'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/yatube-cache',
+    }})
+    def test_refuses_non_atomic_l2(self):
+        """L2 без атомарных add и incr не принимается."""
+        with self.assertRaises(ImproperlyConfigured):
+            TieredCache('shared', {})
+
+
+class DatabaseCacheTest(TestCase):
+    databases = {'default', 'cache'}
+
+    def setUp(self):
+        self.cache = DatabaseCache('shared', {})
+
+    def test_values_and_counters(self):
+        """Любые значения хранятся как есть, целые — числом."""
+        self.cache.set('post', {'pk': 1})
+        self.assertEqual(self.cache.get('post'), {'pk': 1})
+        self.cache.set('seq', 1)
+        self.assertEqual(self.cache.incr('seq', 2), 3)
+        self.assertEqual(self.cache.get_many(['seq', 'post', 'none']), {
+            'seq': 3, 'post': {'pk': 1}
+        })
+        with self.assertRaises(ValueError):
+            self.cache.incr('none')
+
+    def test_add_and_expiry(self):
+        """add не перезаписывает живую запись, но занимает истёкшую."""
+        self.assertTrue(self.cache.add('lock', 1))
+        self.assertFalse(self.cache.add('lock', 2))
+        self.cache.set('lock', 1, timeout=0)
+        self.assertIsNone(self.cache.get('lock'))
+        self.assertTrue(self.cache.add('lock', 3))
+        self.assertEqual(self.cache.get('lock'), 3)
+
+    def test_writes_outside_app_transaction(self):
+        """Запись в кэш не откатывается вместе с транзакцией приложения."""
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                self.cache.set('key', 'value')
+                1 / 0
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+# Одновременные записи из потоков в общую in-memory базу SQLite сразу
+# падают с «table is locked», поэтому нужна база тестов в файле
+@skipUnless(
+    settings.DATABASES['cache'].get('TEST', {}).get('NAME'),
+    'база кэша для тестов в памяти, см. yatube/settings_test.py'
+)
+class DatabaseCacheRaceTest(TransactionTestCase):
+    databases = {'default', 'cache'}
+
+    def race(self, func, workers=4):
+        """Запускает func одновременно в нескольких потоках."""
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def run():
+            cache = DatabaseCache('shared', {})
+            try:
+                barrier.wait()
+                results.append(func(cache))
+            finally:
+                connections[cache.db].close()
+
+        threads = [threading.Thread(target=run) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_add_has_single_winner(self):
+        """Из одновременных add проходит ровно один."""
+        results = self.race(lambda cache: cache.add('lock', 1))
+        self.assertEqual(sorted(results), [False, False, False, True])
+
+    def test_incr_values_are_unique(self):
+        """Одновременные incr получают разные значения."""
+        DatabaseCache('shared', {}).set('seq', 0)
+        results = self.race(lambda cache: cache.incr('seq'))
+        self.assertEqual(sorted(results), [1, 2, 3, 4])
@@ -0,0 +1,93 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..jobs import (
+    DONE_RETENTION, LOCK_TIMEOUT, create_job, job, purge_finished, run_next
+)
+from ..management.commands import runworker
+from ..models import Job
+
+calls = []
+
+
+@job()
+def remember_call(value):
+    calls.append(value)
+
+
+@job(max_attempts=2)
+def always_fails():
+    raise RuntimeError('сломалось')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_higher_priority_runs_first(self):
+        """Задачи с большим приоритетом выполняются раньше."""
+        create_job(remember_call.job_name, ['low'], priority=-10)
+        create_job(remember_call.job_name, ['high'], priority=10)
+        while run_next('test'):
+            pass
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+    def test_failed_job_is_retried_later(self):
+        """Упавшая задача возвращается в очередь с паузой."""
+        created = create_job(always_fails.job_name)
+        run_next('test')
+        failed = Job.objects.get(pk=created.pk)
+        self.assertEqual(failed.status, Job.QUEUED)
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.run_at, timezone.now())
+        self.assertIn('сломалось', failed.last_error)
+        self.assertIsNone(run_next('test'))
+
+    def test_job_gives_up_after_max_attempts(self):
+        """После предела попыток задача помечается проваленной."""
+        created = create_job(always_fails.job_name)
+        for _ in range(2):
+            Job.objects.filter(pk=created.pk).update(run_at=timezone.now())
+            run_next('test')
+        self.assertEqual(Job.objects.get(pk=created.pk).status, Job.FAILED)
+
+    def test_delayed_job_waits(self):
+        """Задача с отсрочкой не берётся раньше времени."""
+        create_job(remember_call.job_name, ['later'], delay=60)
+        self.assertIsNone(run_next('test'))
+        self.assertEqual(calls, [])
+
+    def test_old_finished_jobs_are_purged(self):
+        """Выполненные задачи удаляются, когда истёк срок хранения."""
+        old = create_job(remember_call.job_name, ['old'])
+        fresh = create_job(remember_call.job_name, ['fresh'])
+        queued = create_job(remember_call.job_name, ['queued'], delay=60)
+        while run_next('test'):
+            pass
+        Job.objects.filter(pk=old.pk).update(
+            finished_at=timezone.now() - timedelta(seconds=DONE_RETENTION + 1)
+        )
+        self.assertEqual(purge_finished(), 1)
+        self.assertEqual(
+            set(Job.objects.values_list('pk', flat=True)),
+            {fresh.pk, queued.pk}
+        )
+
+    @mock.patch.object(runworker, 'connections')
+    @mock.patch.object(runworker, 'close_old_connections')
+    def test_worker_requeues_stale_jobs(self, *mocks):
+        """Обработчик сам возвращает и выполняет задачу упавшего соседа."""
+        stale = create_job(remember_call.job_name, ['stale'])
+        Job.objects.filter(pk=stale.pk).update(
+            status=Job.RUNNING,
+            locked_by='dead',
+            locked_at=timezone.now() - timedelta(seconds=LOCK_TIMEOUT + 1),
+        )
+        runworker.work('test', True, 0, threading.Event())
+        self.assertEqual(calls, ['stale'])
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, Job.DONE)
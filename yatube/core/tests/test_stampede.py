@@ -0,0 +1,80 @@
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from ..stampede import lock_key, locks, remember, should_recompute
+
+
+class RememberTest(TestCase):
+    databases = {'default', 'cache'}
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_is_computed_once(self):
+        """Пока значение свежее, compute() больше не вызывается."""
+        self.assertEqual(remember('key', self.compute, 60), 1)
+        self.assertEqual(remember('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_while_other_recomputes(self):
+        """Пока пересчитывает другой запрос, отдаётся прежнее значение."""
+        cache.set('key', ('old', 0, time.time() - 1))
+        locks().add(lock_key('key'), 1)
+        self.assertEqual(remember('key', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
+
+    # Потоки видят записи друг друга только в L2 в памяти процесса:
+    # DatabaseCache внутри TestCase живёт в незакоммиченной транзакции
+    @override_settings(CACHES={**settings.CACHES, 'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'race',
+    }})
+    def test_racing_requests_compute_once(self):
+        """Из одновременных промахов считает один, остальные ждут его."""
+        barrier = threading.Barrier(2)
+        results = []
+
+        def slow_compute():
+            time.sleep(0.2)
+            return self.compute()
+
+        def request():
+            barrier.wait()
+            results.append(remember('key', slow_compute, 60))
+
+        threads = [threading.Thread(target=request) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1, 1])
+
+    def test_early_recompute_near_expiry(self):
+        """Долгое вычисление у самого срока пересчитывается заранее."""
+        with mock.patch('core.stampede.random.random', return_value=0.5):
+            self.assertTrue(should_recompute(('value', 10, time.time() + 1)))
+            self.assertFalse(
+                should_recompute(('value', 0.1, time.time() + 60))
+            )
+
+    def test_fragment_tag(self):
+        """{% cache %} из stampede кэширует фрагмент."""
+        template = Template(
+            '{% load stampede %}{% cache 60 frag key %}{{ value }}'
+            '{% endcache %}'
+        )
+        first = template.render(Context({'key': 1, 'value': 'a'}))
+        second = template.render(Context({'key': 1, 'value': 'b'}))
+        self.assertEqual((first, second), ('a', 'a'))
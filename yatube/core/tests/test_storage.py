@@ -0,0 +1,88 @@
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from ..storage import (
+    FILE_MODE, SHARDED_RE, HashedStorage, immutable, save_in_place
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_content_stored_once(self):
+        """Одинаковое содержимое — одно имя и один файл."""
+        storage = HashedStorage()
+        digest = hashlib.sha256(b'meme').hexdigest()
+        first = storage.save('posts/meme.JPG', ContentFile(b'meme'))
+        second = storage.save('posts/repost.jpg', ContentFile(b'meme'))
+        self.assertEqual(
+            first, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(
+            storage.listdir(f'posts/{digest[:2]}/{digest[2:4]}'),
+            ([], [f'{digest}.jpg'])
+        )
+        self.assertTrue(immutable(first))
+        self.assertTrue(SHARDED_RE.search(first))
+
+    def test_thumbnails_are_immutable(self):
+        """Превью sorl с md5 в имени кэшируются навсегда, прочее — нет."""
+        digest = hashlib.md5(b'thumbnail').hexdigest()
+        self.assertTrue(
+            immutable(f'cache/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        )
+        self.assertFalse(immutable(f'posts/{digest}.jpg'))
+        self.assertFalse(immutable('cache/ab/cd/preview.jpg'))
+
+    def test_duplicate_refreshes_mtime(self):
+        """Повторная загрузка освежает старый файл для gc_media."""
+        storage = HashedStorage()
+        name = storage.save('posts/old.gif', ContentFile(b'old'))
+        os.utime(storage.path(name), (0, 0))
+        storage.save('posts/again.gif', ContentFile(b'old'))
+        self.assertGreater(os.stat(storage.path(name)).st_mtime, 0)
+
+    def test_delete_keeps_shared_file(self):
+        """Обычное удаление не трогает файл: на него могут ссылаться."""
+        storage = HashedStorage()
+        name = storage.save('posts/a.gif', ContentFile(b'gif'))
+        storage.delete(name)
+        self.assertTrue(storage.exists(name))
+        storage.force_delete(name)
+        self.assertFalse(storage.exists(name))
+
+    def test_uploads_readable_by_web_server(self):
+        """Без FILE_UPLOAD_PERMISSIONS файл читают все, не только владелец."""
+        storage = HashedStorage()
+        name = storage.save('posts/mode.gif', ContentFile(b'mode'))
+        mode = stat.S_IMODE(os.stat(storage.path(name)).st_mode)
+        self.assertEqual(mode, FILE_MODE)
+        storage = HashedStorage(file_permissions_mode=0o640)
+        name = storage.save('posts/mode.gif', ContentFile(b'other'))
+        mode = stat.S_IMODE(os.stat(storage.path(name)).st_mode)
+        self.assertEqual(mode, 0o640)
+
+    def test_save_in_place_overwrites(self):
+        """Повторная запись под тем же именем не плодит копий."""
+        storage = HashedStorage()
+        for content in (b'first', b'second'):
+            save_in_place(storage, 'variants/a.480w.jpg', ContentFile(content))
+        self.assertEqual(
+            storage.listdir('variants'), ([], ['a.480w.jpg'])
+        )
+        with storage.open('variants/a.480w.jpg') as file:
+            self.assertEqual(file.read(), b'second')
@@ -1,4 +1,13 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views import static
+
+from .storage import immutable
+
+# Год — дольше браузеры всё равно не хранят
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 
 def page_not_found(request, exception):
@@ -16,3 +25,22 @@ def intern_error(request):
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html',
                   {'path': request.path}, status=403)
+
+
+@staff_member_required
+def cache_stats(request):
+    # Счётчики только того процесса, что обработал запрос
+    stats = getattr(cache, 'stats', None)
+    return JsonResponse(stats() if stats else {})
+
+
+def serve_media(request, path, document_root=None):
+    """Медиафайлы для разработки; неизменяемые файлы — навсегда.
+
+    На боевом сервере то же правило (core.storage.immutable: хэш в
+    имени или превью sorl) задаётся в конфигурации веб-сервера.
+    """
+    response = static.serve(request, path, document_root=document_root)
+    if immutable(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
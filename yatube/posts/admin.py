@@ -17,6 +17,9 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_feed()
+
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -24,4 +27,5 @@ class CommentAdmin(admin.ModelAdmin):
     list_editable = ('text',)
     search_fields = ('text',)
     list_filter = ('created',)
+    list_select_related = ('author', 'post')
     empty_value_display = '-пусто-'
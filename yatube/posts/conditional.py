@@ -0,0 +1,125 @@
+"""Валидаторы условного GET для лент, профиля и страницы поста.
+
+Для каждой области ('global', 'group:<id>', 'author:<id>', 'post:<id>')
+в кэше хранится время её последнего изменения: новый пост, правка,
+лайк, комментарий, подписка. Сигналы сдвигают его при записи, так что
+ETag и Last-Modified считаются без запросов к ленте и без рендеринга.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import Group, Post, User
+
+
+def modified_key(scope):
+    return f'posts:modified:{scope}'
+
+
+def touch(*scopes):
+    """Отмечает, что содержимое областей изменилось."""
+    now = timezone.now()
+    cache.set_many({modified_key(scope): now for scope in scopes}, None)
+
+
+def last_modified(scopes):
+    """Время последнего изменения областей.
+
+    Неизвестное время считаем текущим: клиент в худшем случае получит
+    страницу целиком ещё раз.
+    """
+    keys = [modified_key(scope) for scope in scopes]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, timezone.now(), None)
+            stamps[key] = cache.get(key)
+    return max(stamps.values())
+
+
+def viewer(request):
+    if request.user.is_authenticated:
+        return f'user{request.user.pk}'
+    return 'anon'
+
+
+def page_etag(request, scopes):
+    stamp = last_modified(scopes).timestamp()
+    return f'W/"{"+".join(scopes)}-{stamp}-{viewer(request)}"'
+
+
+def page_last_modified(request, scopes):
+    """Last-Modified для анонимов; None, пока идёт секунда изменения.
+
+    Last-Modified точен до секунды. Отданный в ту же секунду, что и
+    правка, он совпал бы с датой следующей правки в эту же секунду, и
+    If-Modified-Since дал бы 304 на устаревшую страницу. Поэтому пока
+    секунда не кончилась, валидатор — только ETag (он точнее секунды):
+    любая правка после отданной даты попадёт уже в следующую секунду.
+    """
+    if request.user.is_authenticated:
+        return None
+    stamp = last_modified(scopes)
+    if int(stamp.timestamp()) >= int(timezone.now().timestamp()):
+        return None
+    return stamp
+
+
+def conditional_page(scopes_func):
+    """condition() для страницы, которая зависит от областей scopes_func.
+
+    ETag различается по зрителю, а Last-Modified отдаётся только
+    анонимам — иначе валидатор мог бы подойти другому пользователю.
+    """
+    def scopes(request, *args, **kwargs):
+        if request.method != 'GET':
+            return None
+        # etag и modified зовутся для одного запроса — ищем области раз
+        if not hasattr(request, 'conditional_scopes'):
+            request.conditional_scopes = scopes_func(*args, **kwargs)
+        return request.conditional_scopes
+
+    def etag(request, *args, **kwargs):
+        names = scopes(request, *args, **kwargs)
+        if not names:
+            return None
+        return page_etag(request, names)
+
+    def modified(request, *args, **kwargs):
+        names = scopes(request, *args, **kwargs)
+        if not names:
+            return None
+        return page_last_modified(request, names)
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=modified)(view)
+        # По этим областям страницы кэшируют posts.middleware
+        view.page_scopes = scopes_func
+        return view
+    return decorator
+
+
+def index_scopes():
+    return ['global']
+
+
+def group_scopes(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    return group_id and [f'group:{group_id}']
+
+
+def profile_scopes(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    return author_id and [f'author:{author_id}']
+
+
+def detail_scopes(post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    # На странице поста видны и счётчики автора
+    return author_id and [f'post:{post_id}', f'author:{author_id}']
@@ -0,0 +1,122 @@
+from django.core.cache import cache
+from django.db.models import Q
+
+from core.stampede import remember
+
+from .models import Post
+from .paginators import FEED_ORDERING
+
+# Сколько верхних записей ленты держим в кэше списком (pub_date, pk)
+FEED_IDS_LENGTH = 1000
+FEED_IDS_TIMEOUT = 60 * 60
+# Карточка поста: экземпляр Post вместе с автором и группой
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(pk):
+    return f'posts:card:{pk}'
+
+
+def get_cards(entries):
+    """Посты по списку (pub_date, pk) одним get_many; промахи — из БД."""
+    keys = [card_key(pk) for _, pk in entries]
+    cached = cache.get_many(keys)
+    missing = [pk for _, pk in entries if card_key(pk) not in cached]
+    if missing:
+        posts = Post.objects.for_feed().in_bulk(missing)
+        fetched = {card_key(pk): post for pk, post in posts.items()}
+        cache.set_many(fetched, CARD_TIMEOUT)
+        cached.update(fetched)
+    return [
+        cached[card_key(pk)] for _, pk in entries if card_key(pk) in cached
+    ]
+
+
+def forget_card(pk):
+    cache.delete(card_key(pk))
+
+
+def forget_cards(pks):
+    cache.delete_many([card_key(pk) for pk in pks])
+
+
+def feed_key(scope):
+    return f'posts:feed_ids:{scope}'
+
+
+def forget_feeds(scopes):
+    cache.delete_many([feed_key(scope) for scope in scopes])
+
+
+class EntryFeed:
+    """Лента как упорядоченный список (pub_date, pk) для Paginator.
+
+    Срезы превращаются в посты через кэш карточек. Если список — лишь
+    верхушка ленты, queryset отвечает за всё, что за её пределами.
+    """
+    ordered = True
+
+    def __init__(self, entries, queryset=None):
+        self.entries = entries
+        self.queryset = queryset
+
+    def order_by(self, *fields):
+        # Записи уже идут в порядке FEED_ORDERING
+        return self
+
+    def count(self):
+        if self.queryset is None:
+            return len(self.entries)
+        return self.queryset.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = index.stop
+        if self.queryset is None or (
+            stop is not None and stop <= len(self.entries)
+        ):
+            return get_cards(self.entries[index])
+        return list(self.queryset[index])
+
+    def older(self, pub_date, pk):
+        key = (pub_date, pk)
+        entries = [entry for entry in self.entries if entry < key]
+        if self.queryset is None:
+            return EntryFeed(entries)
+        return EntryFeed(entries, self.queryset.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+        ))
+
+    def newer(self, pub_date, pk):
+        key = (pub_date, pk)
+        if self.queryset is not None and (
+            not self.entries or key < self.entries[-1]
+        ):
+            # Ключ глубже кэшированной верхушки — идём в БД
+            return self.queryset.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            ).reverse()
+        return EntryFeed(
+            [entry for entry in reversed(self.entries) if entry > key]
+        )
+
+
+def cached_feed(scope, queryset):
+    """Лента scope из кэша списков; при промахе — один запрос в БД.
+
+    Пересчёт списка выполняет один запрос, остальные ждут его (remember).
+    """
+    queryset = queryset.order_by(*FEED_ORDERING)
+
+    def compute():
+        entries = list(queryset.values_list(
+            'pub_date', 'pk'
+        )[:FEED_IDS_LENGTH + 1])
+        return entries[:FEED_IDS_LENGTH], len(entries) <= FEED_IDS_LENGTH
+
+    entries, complete = remember(feed_key(scope), compute, FEED_IDS_TIMEOUT)
+    return EntryFeed(entries, None if complete else queryset)
@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from . import uploads
 from .models import Post, Comment
 
 User = get_user_model()
@@ -16,6 +19,13 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Поле должно быть заполнено')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # Новая загрузка; иначе это уже сохранённый файл или очистка поля
+        if isinstance(image, UploadedFile):
+            return uploads.normalize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,52 @@
+"""Поколения кэша: O(1) устаревание всех ключей одной области.
+
+У каждой области ('global', 'group:<id>', 'author:<id>', 'post:<id>',
+'follow:<user_id>', 'liked:<user_id>') есть счётчик в кэше. Ключи,
+построенные для области, содержат его значение; bump() увеличивает
+счётчик, и старые ключи просто перестают читаться и доживают свой TTL.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def generation_key(scope):
+    return f'posts:gen:{scope}'
+
+
+def initial_generation():
+    # Не с единицы: после вытеснения счётчика старые ключи не оживут
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    """Текущие поколения областей одним get_many."""
+    keys = {generation_key(scope): scope for scope in scopes}
+    cached = cache.get_many(keys)
+    generations = {}
+    for key, scope in keys.items():
+        if key not in cached:
+            cache.add(key, initial_generation(), None)
+            cached[key] = cache.get(key)
+        generations[scope] = cached[key]
+    return generations
+
+
+def bump(*scopes):
+    """Делает устаревшими все ключи перечисленных областей."""
+    for scope in scopes:
+        try:
+            cache.incr(generation_key(scope))
+        except ValueError:
+            cache.set(generation_key(scope), initial_generation(), None)
+
+
+def version(scopes):
+    """Строка поколений для vary_on ключа кэша."""
+    generations = get_generations(scopes)
+    return '.'.join(str(generations[scope]) for scope in scopes)
+
+
+def page_version(scope, page):
+    """Версия страницы ленты: поколение ленты и каждого поста на ней."""
+    return version([scope] + [f'post:{post.pk}' for post in page])
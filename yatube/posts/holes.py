@@ -0,0 +1,101 @@
+"""Дырки в общей для всех странице: части, которые зависят от зрителя.
+
+Шаблон вместо такой части выводит {% hole 'имя' аргументы %} — метку
+<!--hole [...]-->. Страница с метками одинакова для всех и кэшируется
+(PageShellMiddleware), а метки заполняются на каждый запрос маленькими
+шаблонами. Отношения зрителя к постам и авторам всей страницы
+собираются заранее (relations) и загружаются одним запросом на вид.
+"""
+import json
+import re
+
+from django.middleware.csrf import get_token
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .forms import CommentForm
+from .relations import for_request
+
+HOLE_RE = re.compile(r'<!--hole (\[[^<>]*?\])-->')
+
+
+def marker(name, *args):
+    return mark_safe(f'<!--hole {json.dumps([name, *args])}-->')
+
+
+def user_nav(request):
+    return {}
+
+
+def switcher(request, tab):
+    return {tab: True}
+
+
+def like_button(request, post_id, likes_count):
+    return {'post_id': post_id, 'likes_count': likes_count}
+
+
+def follow_button(request, author_id, username):
+    return {'author_id': author_id, 'username': username}
+
+
+def comment_form(request, post_id):
+    # Форма видна только залогиненным; get_token() для анонима поставил бы
+    # куки csrftoken, и страница перестала бы попадать в кэш
+    if not request.user.is_authenticated:
+        return {'post_id': post_id}
+    return {
+        'post_id': post_id,
+        'form': CommentForm(),
+        'csrf_token': get_token(request),
+    }
+
+
+def author_actions(request, post_id, author_id):
+    return {'post_id': post_id, 'author_id': author_id}
+
+
+# имя: (шаблон, контекст одной дырки, отношения зрителя к аргументу N)
+HOLES = {
+    'user_nav': ('includes/user_nav.html', user_nav, ()),
+    'switcher': ('posts/includes/switcher.html', switcher, ()),
+    'like_button': (
+        'posts/includes/like_button.html', like_button,
+        (('liked', 0), ('commented', 0)),
+    ),
+    'follow_button': (
+        'posts/includes/follow_button.html', follow_button,
+        (('follows', 0),),
+    ),
+    'comment_form': ('posts/includes/comment_form.html', comment_form, ()),
+    'author_actions': (
+        'posts/includes/author_actions.html', author_actions, ()
+    ),
+}
+
+
+def fill(request, content):
+    """Заменяет метки в HTML на части для текущего зрителя."""
+    calls = {}
+    for raw in set(HOLE_RE.findall(content)):
+        name, *args = json.loads(raw)
+        if name in HOLES:
+            calls.setdefault(name, []).append((raw, args))
+    if not calls:
+        return content
+    # Все id страницы заранее: каждое отношение загрузится одним запросом
+    relations = for_request(request)
+    for name, holes in calls.items():
+        for relation, index in HOLES[name][2]:
+            relations.want(relation, [args[index] for _, args in holes])
+    base = {'request': request, 'user': request.user}
+    rendered = {}
+    for name, holes in calls.items():
+        template_name, make_context, _ = HOLES[name]
+        template = get_template(template_name)
+        for raw, args in holes:
+            context = dict(base, **make_context(request, *args))
+            rendered[raw] = template.render(context)
+    return HOLE_RE.sub(
+        lambda match: rendered.get(match.group(1), ''), content
+    )
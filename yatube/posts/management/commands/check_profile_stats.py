@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import ProfileStats
+from posts.stats import STATS_FIELDS, actual_stats
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Сверяет ProfileStats с таблицами и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Записать настоящие значения вместо устаревших.'
+        )
+
+    def handle(self, *args, **options):
+        actual = actual_stats()
+        drifted = []
+        for stats in ProfileStats.objects.iterator(chunk_size=BATCH_SIZE):
+            changed = False
+            for field in STATS_FIELDS:
+                value = actual[field].get(stats.user_id, 0)
+                if getattr(stats, field) != value:
+                    self.stdout.write(
+                        f'{stats.user_id}: {field} '
+                        f'{getattr(stats, field)} -> {value}'
+                    )
+                    setattr(stats, field, value)
+                    changed = True
+            if changed:
+                drifted.append(stats)
+        if options['repair']:
+            ProfileStats.objects.bulk_update(
+                drifted, STATS_FIELDS, batch_size=BATCH_SIZE
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Расхождений: {len(drifted)}'
+            + (' (исправлено)' if options['repair'] and drifted else '')
+        ))
@@ -0,0 +1,194 @@
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from posts import sorl_compat, uploads
+from posts.models import Post
+
+BATCH_SIZE = 1000
+# Свежие файлы не трогаем: загрузка могла ещё не дойти до базы, а
+# кэшированные страницы — ссылаться на картинку до shard_media
+MIN_AGE_HOURS = 24
+# Расширения оригиналов, которые дают HashedStorage и форма поста
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+
+def scan(root, directory, recursive):
+    """(имя от MEDIA_ROOT, mtime, размер) файлов каталога directory."""
+    found = []
+    for path, subdirectories, files in os.walk(os.path.join(root, directory)):
+        if not recursive:
+            # Подкаталоги сканируют другие задачи пула
+            subdirectories.clear()
+        for filename in files:
+            full_path = os.path.join(path, filename)
+            try:
+                stat = os.stat(full_path)
+            except FileNotFoundError:
+                continue
+            name = os.path.relpath(full_path, root).replace(os.sep, '/')
+            found.append((name, stat.st_mtime, stat.st_size))
+    return found
+
+
+def live_names():
+    """Картинки постов, их корни (для вариантов) и имена их превью.
+
+    Превью берутся из записей KV-хранилища sorl, а не из нынешних
+    THUMBNAILS: превью старых геометрий, на которые ещё есть записи,
+    не удаляются. Превью живой картинки без записи удалится — sorl
+    создаст его заново при следующем показе.
+    """
+    images, roots = set(), set()
+
+    def files():
+        posts = Post.objects.exclude(image='').only('image')
+        for post in posts.iterator(chunk_size=BATCH_SIZE):
+            images.add(post.image.name)
+            roots.add(os.path.splitext(post.image.name)[0])
+            yield post.image
+
+    thumbs = sorl_compat.stored_thumbnails(files(), BATCH_SIZE)
+    return images, roots, thumbs
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет или откладывает в карантин картинки, варианты и превью, '
+        'на которые больше не ссылается ни один пост.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не удалять.'
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Каталог, куда переносить файлы вместо удаления.'
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=MIN_AGE_HOURS,
+            help='Не трогать файлы моложе стольких часов.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Сколько каталогов сканировать параллельно.'
+        )
+
+    def directories(self, root):
+        """(каталог, рекурсивно ли): по одной задаче пула на подкаталог."""
+        prefixes = (
+            Post._meta.get_field('image').upload_to,
+            sorl_settings.THUMBNAIL_PREFIX,
+        )
+        for prefix in prefixes:
+            prefix = prefix.strip('/')
+            base = os.path.join(root, prefix)
+            if not os.path.isdir(base):
+                continue
+            # Файлы прямо в корне префикса — старая плоская раскладка
+            yield prefix, False
+            for entry in os.scandir(base):
+                if entry.is_dir():
+                    yield f'{prefix}/{entry.name}', True
+
+    def is_live(self, name, images, roots, thumbs):
+        if name in images or name in thumbs:
+            return True
+        root = uploads.variant_root(name)
+        return root is not None and root in roots
+
+    def handle(self, *args, **options):
+        if not sorl_compat.SUPPORTED:
+            raise CommandError(
+                'Эта версия sorl-thumbnail или её KV-хранилище не '
+                'поддерживаются (posts.sorl_compat): превью не найти.'
+            )
+        started = time.monotonic()
+        root = settings.MEDIA_ROOT
+        edge = time.time() - options['min_age'] * 60 * 60
+        images, roots, thumbs = live_names()
+        self.stdout.write(f'Картинок у постов: {len(images)}')
+        scanned = orphans = freed = 0
+        batch = []
+        with ThreadPoolExecutor(options['workers']) as pool:
+            results = pool.map(
+                lambda task: scan(root, *task), self.directories(root)
+            )
+            for found in results:
+                for name, mtime, size in found:
+                    scanned += 1
+                    if mtime > edge or self.is_live(
+                        name, images, roots, thumbs
+                    ):
+                        continue
+                    orphans += 1
+                    freed += size
+                    batch.append(name)
+                    if len(batch) >= BATCH_SIZE:
+                        self.collect(root, batch, options)
+                        batch = []
+        self.collect(root, batch, options)
+        elapsed = time.monotonic() - started
+        verb = 'Найдено' if options['dry_run'] else 'Убрано'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {scanned} '
+            f'({scanned / elapsed:.0f} файлов/с). {verb} ненужных: '
+            f'{orphans}, {freed / 2 ** 20:.1f} МБ'
+        ))
+
+    def still_orphaned(self, names):
+        """Имена пачки, которые и сейчас не нужны ни одному посту.
+
+        Живые имена собраны в начале прохода: за это время новый пост
+        мог получить картинку-дубликат уже найденного сироты. Оригиналы
+        и оригиналы вариантов пачки проверяются одним запросом.
+        """
+        # возможное имя оригинала -> файлы пачки, которые ему нужны
+        candidates = {}
+        for name in names:
+            root = uploads.variant_root(name)
+            originals = [name] if root is None else [
+                root + extension for extension in IMAGE_EXTENSIONS
+            ]
+            for original in originals:
+                candidates.setdefault(original, []).append(name)
+        owned = set()
+        for image in Post.objects.filter(
+            image__in=candidates
+        ).values_list('image', flat=True):
+            owned.update(candidates[image])
+        return [name for name in names if name not in owned]
+
+    def collect(self, root, names, options):
+        """Удаляет или переносит пачку файлов и чистит KV-хранилище sorl."""
+        if not names or options['dry_run']:
+            return
+        names = self.still_orphaned(names)
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                if options['quarantine']:
+                    target = os.path.join(options['quarantine'], name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+        # Записи sorl об убранных файлах и о превью убранных оригиналов
+        image_storage = Post._meta.get_field('image').storage
+        sorl_compat.forget_many(
+            ImageFile(name, default.storage if name.startswith(
+                sorl_settings.THUMBNAIL_PREFIX
+            ) else image_storage)
+            for name in names
+        )
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+BATCH_SIZE = 50
+CHECKPOINT = os.path.join(settings.BASE_DIR, 'cache', 'rebuild_thumbnails')
+
+
+def rebuild_batch(pks, force):
+    """Превью пачки постов; выполняется в процессе пула."""
+    built = failed = 0
+    for post in Post.objects.filter(pk__in=pks).exclude(image=''):
+        width = post.variant_width
+        if thumbnails.build(post, force):
+            built += 1
+            if not post.thumbnails_ready or post.variant_width != width:
+                thumbnails.mark_ready(post)
+        else:
+            failed += 1
+    return built, failed
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as checkpoint:
+            return int(checkpoint.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, last_pk):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Через временный файл: прерванная запись не испортит отметку
+    with open(f'{path}.tmp', 'w') as checkpoint:
+        checkpoint.write(str(last_pk))
+    os.replace(f'{path}.tmp', path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт превью и варианты всех картинок постов в пуле процессов; '
+        'прерванный запуск продолжается с последней пачки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Размер пула; 0 — всё в текущем процессе.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов отдавать процессу за раз.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Удалить и создать заново уже готовые превью.'
+        )
+        parser.add_argument(
+            '--checkpoint', default=CHECKPOINT,
+            help='Файл с id последнего обработанного поста.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с начала, не глядя на отметку.'
+        )
+
+    def batches(self, after, size):
+        """id постов с картинками пачками по size, по возрастанию id."""
+        posts = Post.objects.exclude(image='').order_by('pk')
+        while True:
+            pks = list(posts.filter(pk__gt=after).values_list(
+                'pk', flat=True
+            )[:size])
+            if not pks:
+                return
+            after = pks[-1]
+            yield pks
+
+    def handle(self, *args, **options):
+        path = options['checkpoint']
+        after = 0 if options['restart'] else read_checkpoint(path)
+        if after:
+            self.stdout.write(f'Продолжаем после поста {after}')
+        processes = options['processes']
+        if processes:
+            # Соединения с БД не должны переходить в дочерние процессы
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(processes)
+            submit = pool.apply_async
+        else:
+            pool = submit = None
+        started = time.monotonic()
+        built = failed = 0
+        # Не больше двух пачек на процесс в работе: память не растёт, а
+        # отметка пишется строго по порядку — до неё всё уже готово
+        pending = deque()
+
+        def finish(pks, result):
+            nonlocal built, failed
+            built += result[0]
+            failed += result[1]
+            write_checkpoint(path, pks[-1])
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'До поста {pks[-1]}: готово {built}, с ошибкой {failed}, '
+                f'{(built + failed) / elapsed:.1f} постов/с'
+            )
+
+        try:
+            for pks in self.batches(after, options['batch_size']):
+                if pool is None:
+                    finish(pks, rebuild_batch(pks, options['force']))
+                    continue
+                pending.append(
+                    (pks, submit(rebuild_batch, (pks, options['force'])))
+                )
+                if len(pending) >= processes * 2:
+                    pks, result = pending.popleft()
+                    finish(pks, result.get())
+            while pending:
+                pks, result = pending.popleft()
+                finish(pks, result.get())
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        # Проход завершён — следующий запуск начнёт сначала
+        if os.path.exists(path):
+            os.remove(path)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Превью готовы: {built}, не удалось: {failed}, '
+            f'за {elapsed:.1f} с'
+        ))
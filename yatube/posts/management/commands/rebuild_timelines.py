@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок (Timeline) по текущим подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Чьи ленты пересобрать; по умолчанию — всех подписчиков.'
+        )
+
+    def handle(self, *args, **options):
+        if options['usernames']:
+            user_ids = User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('pk', flat=True)
+        else:
+            user_ids = Follow.objects.values_list(
+                'user_id', flat=True
+            ).distinct()
+        rebuilt = 0
+        for user_id in user_ids.iterator():
+            timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {rebuilt}'
+        ))
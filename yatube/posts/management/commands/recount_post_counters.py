@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.models import COUNTER_FIELDS, Comment, Like, Post
+from posts.signals import post_changed
+from posts.stats import grouped_counts
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает likes_count и comments_count постов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов пересчитывать за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        checked = fixed = 0
+        while True:
+            posts = list(Post.objects.filter(pk__gt=last_pk).order_by(
+                'pk'
+            ).only(
+                'pk', 'author', 'group', *COUNTER_FIELDS
+            )[:batch_size])
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            pks = [post.pk for post in posts]
+            likes = grouped_counts(
+                Like.objects.filter(post_id__in=pks), 'post_id'
+            )
+            comments = grouped_counts(
+                Comment.objects.filter(post_id__in=pks), 'post_id'
+            )
+            changed = []
+            now = timezone.now()
+            for post in posts:
+                actual = (likes.get(post.pk, 0), comments.get(post.pk, 0))
+                if (post.likes_count, post.comments_count) != actual:
+                    post.likes_count, post.comments_count = actual
+                    # Новый updated_at меняет ключ фрагмента карточки
+                    post.updated_at = now
+                    changed.append(post)
+            Post.objects.bulk_update(changed, COUNTER_FIELDS + ('updated_at',))
+            # bulk_update проходит мимо post_save: закэшированный объект
+            # карточки со старыми счётчиками сбрасываем сами
+            for post in changed:
+                post_changed(post)
+            checked += len(posts)
+            fixed += len(changed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено постов: {checked}, исправлено: {fixed}'
+        ))
@@ -0,0 +1,81 @@
+import time
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.storage import SHARDED_RE
+from posts import thumbnails
+from posts.models import Post
+from posts.signals import post_changed
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в раскладку по подкаталогам хэша '
+        '(core.storage.HashedStorage) и обновляет Post.image. Пока '
+        'runworker не создаст превью под новым именем, на сайте у '
+        'перенесённых постов показывается заглушка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов переносить за один проход.'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза в секундах между пачками, чтобы не мешать сайту.'
+        )
+
+    def move(self, post):
+        """Копирует картинку на новое место; новое имя или None."""
+        storage = post.image.storage
+        try:
+            with storage.open(post.image.name) as file:
+                return storage.save(post.image.name, file)
+        except (OSError, SuspiciousFileOperation) as error:
+            self.stderr.write(f'Пост {post.pk}: {error}')
+            return None
+
+    def handle(self, *args, **options):
+        # Уже перенесённые не выбираются — повторный запуск продолжит
+        # с того места, где остановился прошлый
+        posts = Post.objects.exclude(image='').exclude(
+            image__regex=SHARDED_RE.pattern
+        ).order_by('pk').only('pk', 'image', 'author', 'group')
+        last_pk = 0
+        moved = skipped = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[
+                :options['batch_size']
+            ])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for post in batch:
+                name = self.move(post)
+                # Условный UPDATE: если картинку успели сменить, пока
+                # шёл перенос, новую не трогаем
+                if name is None or not Post.objects.filter(
+                    pk=post.pk, image=post.image.name
+                ).update(
+                    image=name, thumbnails_ready=False, variant_width=None,
+                    updated_at=timezone.now()
+                ):
+                    skipped += 1
+                    continue
+                # UPDATE прошёл мимо post_save: закэшированные страницы и
+                # 304 ссылаются на старое имя, которое уберёт gc_media
+                post_changed(post)
+                # Превью и варианты — заново под новым именем; старые
+                # файлы остаются для уже отданных страниц, их уберёт gc_media
+                thumbnails.generate.delay(post.pk)
+                moved += 1
+            self.stdout.write(f'До поста {last_pk}: перенесено {moved}')
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, пропущено: {skipped}'
+        ))
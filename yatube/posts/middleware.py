@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    http_date, parse_http_date_safe, quote_etag, urlencode
+)
+
+from . import holes
+from .conditional import last_modified, page_etag, page_last_modified
+
+# Сколько живёт страница; изменения областей сбрасывают её раньше
+PAGE_TIMEOUT = 60 * 60
+# Куки, с которыми ответ зависит от посетителя
+PERSONAL_COOKIES = (settings.SESSION_COOKIE_NAME, 'messages')
+# Параметры, которые читают сами представления (номер страницы и курсоры);
+# остальные (?utm=…) не меняют страницу и не должны плодить ключи
+PAGE_PARAMS = ('page', 'after', 'before')
+# Длиннее не бывает ни номер страницы, ни курсор — такое не кэшируем
+PARAM_MAX_LENGTH = 64
+
+
+def page_key(scopes, request, prefix='page'):
+    """Ключ страницы: области, их метка, путь и параметры из PAGE_PARAMS."""
+    values = [
+        (name, request.GET[name])
+        for name in PAGE_PARAMS if request.GET.get(name)
+    ]
+    if any(len(value) > PARAM_MAX_LENGTH for _, value in values):
+        return None
+    stamp = last_modified(scopes).timestamp()
+    params = urlencode(values)
+    return (
+        f'posts:{prefix}:{"+".join(scopes)}:{stamp}:'
+        f'{request.path}?{params}'
+    )
+
+
+def page_scopes(request):
+    """Области страницы, если её представление помечено conditional_page."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    scopes_func = getattr(match.func, 'page_scopes', None)
+    if scopes_func is None:
+        return None
+    # Тот же атрибут читает conditional_page: области ищутся раз на запрос
+    if not hasattr(request, 'conditional_scopes'):
+        request.conditional_scopes = scopes_func(*match.args, **match.kwargs)
+    return request.conditional_scopes
+
+
+class AnonymousPageCacheMiddleware:
+    """Готовые страницы для анонимов: без сессии, CSRF и рендеринга.
+
+    Кэшируются представления с атрибутом page_scopes (его ставит
+    conditional_page). В ключ входит время последнего изменения этих
+    областей, поэтому пост, комментарий или правка группы сразу
+    уводят все зависящие страницы на новые ключи. Посетители с куки
+    сессии или сообщений проходят мимо кэша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        response = cache.get(key)
+        if response is not None:
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')
+                ),
+                response=response,
+            )
+        response = self.get_response(request)
+        if self.cacheable(request, response):
+            cache.set(key, response, PAGE_TIMEOUT)
+        return response
+
+    def cache_key(self, request):
+        if any(name in request.COOKIES for name in PERSONAL_COOKIES):
+            return None
+        scopes = page_scopes(request)
+        if not scopes:
+            return None
+        return page_key(scopes, request)
+
+    def cacheable(self, request, response):
+        user = getattr(request, 'user', None)
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and (user is None or user.is_anonymous)
+        )
+
+
+class PageShellMiddleware:
+    """Общая для всех зрителей страница и дырки, заполняемые на запрос.
+
+    Стоит после AuthenticationMiddleware и всех middleware, которые
+    дописывают заголовки ответа: страница из кэша возвращается, не
+    доходя до тех, что ниже. Для представлений с page_scopes хранит
+    в кэше HTML с метками <!--hole-->: он одинаков для всех, поэтому
+    залогиненные получают те же попадания, что и анонимы. Метки в
+    любом HTML-ответе заполняются holes.fill(), а ETag и Last-Modified
+    пересчитываются для текущего зрителя.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        scopes = page_scopes(request)
+        key = scopes and page_key(scopes, request, 'shell')
+        shell = key and cache.get(key)
+        if shell:
+            response = HttpResponse(shell)
+        else:
+            response = self.get_response(request)
+            if key and self.cacheable(response):
+                cache.set(key, response.content.decode(), PAGE_TIMEOUT)
+        if self.has_holes(response):
+            response.content = holes.fill(
+                request, response.content.decode()
+            )
+        if not shell:
+            return response
+        # Валидаторы того, кто сохранил страницу, нам не подходят
+        response['ETag'] = quote_etag(page_etag(request, scopes))
+        modified = page_last_modified(request, scopes)
+        if modified is not None:
+            modified = int(modified.timestamp())
+            response['Last-Modified'] = http_date(modified)
+        return get_conditional_response(
+            request,
+            etag=response['ETag'],
+            last_modified=modified,
+            response=response,
+        )
+
+    def cacheable(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and response.get('Content-Type', '').startswith('text/html')
+        )
+
+    def has_holes(self, response):
+        return (
+            not response.streaming
+            and response.get('Content-Type', '').startswith('text/html')
+            and b'<!--hole ' in response.content
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_post_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timeline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_feed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timeline',
+            unique_together={('user', 'post')},
+        ),
+    ]
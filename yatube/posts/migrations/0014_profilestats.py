@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+                ('likes_count', models.PositiveIntegerField(default=0, verbose_name='Получено лайков')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_profilestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Лайков'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created', 'id'], name='comment_post_feed_idx'),
+        ),
+    ]
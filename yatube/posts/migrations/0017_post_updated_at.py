@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_comment_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False, verbose_name='Превью готовы'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='variant_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина вариантов'),
+        ),
+    ]
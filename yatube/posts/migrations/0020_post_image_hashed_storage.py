@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:03
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_variant_width'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.HashedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import HashedStorage
+
 User = get_user_model()
 
 
 TEXT_IN_FIELD = 15
+COUNTER_FIELDS = ('likes_count', 'comments_count')
 
 
 class Group(models.Model):
@@ -16,6 +19,12 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для карточек ленты: автор и группа одним запросом."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField('Мысли великих')
     pub_date = models.DateTimeField(
@@ -40,15 +49,55 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        # Одинаковые картинки хранятся один раз, имя — хэш содержимого
+        storage=HashedStorage(),
         blank=True
     )
+    # Превью картинки созданы фоновой задачей (posts.thumbnails)
+    thumbnails_ready = models.BooleanField('Превью готовы', default=False)
+    # Ширина самого крупного варианта для srcset (posts.uploads)
+    variant_width = models.PositiveIntegerField(
+        'Ширина вариантов', null=True, blank=True
+    )
+    # Меняется при любой правке поста и его счётчиков: ключ кэша карточки
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    # Денормализованные счётчики для карточек ленты
+    likes_count = models.PositiveIntegerField('Лайков', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы под keyset-пагинацию лент по (pub_date, id)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_feed_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:TEXT_IN_FIELD]
 
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через F(): не затираем их при правке
+        if not self._state.adding and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -71,6 +120,15 @@ class Comment(models.Model):
         db_index=True
     )
 
+    class Meta:
+        # Индекс под keyset-пагинацию комментариев поста по (created, id)
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_feed_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -107,3 +165,46 @@ class Like(models.Model):
         related_name='liking',
         verbose_name='Лайкаемый',
     )
+
+
+class Timeline(models.Model):
+    """Лента подписок, собранная заранее: пост попадает сюда при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост',
+    )
+    # Копия Post.pub_date, чтобы лента читалась одним проходом по индексу
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx'
+            ),
+        ]
+
+
+class ProfileStats(models.Model):
+    """Счётчики профиля, которые обновляются при записи, а не при показе."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    likes_count = models.PositiveIntegerField('Получено лайков', default=0)
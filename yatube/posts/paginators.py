@@ -0,0 +1,230 @@
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+# Порядок ленты: ключ (pub_date, id) однозначен даже при совпадении дат
+FEED_ORDERING = ('-pub_date', '-pk')
+# Сколько живёт закэшированное число постов ленты
+FEED_COUNT_TIMEOUT = 60 * 15
+# Окно номеров страниц вокруг текущей и по краям
+PAGES_ON_EACH_SIDE = 3
+PAGES_ON_ENDS = 1
+
+
+def encode_cursor(item, date_field='pub_date'):
+    """Непрозрачный токен позиции записи в ленте."""
+    raw = f'{getattr(item, date_field).isoformat()}|{item.pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token):
+    """Возвращает (дата, pk) или None, если токен испорчен."""
+    try:
+        raw = force_str(urlsafe_base64_decode(token))
+        pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+def attach_cursors(page):
+    """Добавляет странице токены соседних страниц для ?after=/?before=.
+
+    Сама страница остаётся обычным Page — шаблоны и тесты полагаются
+    именно на этот тип.
+    """
+    date_field = page.paginator.date_field
+    page.object_list = list(page.object_list)
+    page.next_cursor = None
+    page.previous_cursor = None
+    if page.object_list and page.has_next():
+        page.next_cursor = encode_cursor(page.object_list[-1], date_field)
+    if page.object_list and page.has_previous():
+        page.previous_cursor = encode_cursor(page.object_list[0], date_field)
+    return page
+
+
+class CursorPage(Page):
+    """Страница, выбранная по курсору: номер и общее число неизвестны."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+class CursorPaginator(Paginator):
+    """Paginator с keyset-режимом по (date_field, id).
+
+    Обычный get_page() работает через OFFSET, cursor_page() — через
+    диапазонный запрос по индексу, поэтому глубокие страницы стоят
+    столько же, сколько первая. По умолчанию это лента постов от новых
+    к старым; кроме QuerySet принимает готовые ленты с методами
+    older()/newer() (см. timeline.MergedFeed).
+    """
+    date_field = 'pub_date'
+    descending = True
+
+    def __init__(self, object_list, per_page, **kwargs):
+        sign = '-' if self.descending else ''
+        super().__init__(
+            object_list.order_by(f'{sign}{self.date_field}', f'{sign}pk'),
+            per_page,
+            **kwargs
+        )
+
+    def page(self, number):
+        return attach_cursors(super().page(number))
+
+    def key_filter(self, lookup, date, pk):
+        return self.object_list.filter(
+            Q(**{f'{self.date_field}__{lookup}': date})
+            | Q(**{self.date_field: date, f'pk__{lookup}': pk})
+        )
+
+    def after_key(self, date, pk):
+        """Записи после ключа в порядке ленты."""
+        if not isinstance(self.object_list, QuerySet):
+            return self.object_list.older(date, pk)
+        return self.key_filter('lt' if self.descending else 'gt', date, pk)
+
+    def before_key(self, date, pk):
+        """Записи до ключа, ближайшие к нему первыми."""
+        if not isinstance(self.object_list, QuerySet):
+            return self.object_list.newer(date, pk)
+        return self.key_filter(
+            'gt' if self.descending else 'lt', date, pk
+        ).reverse()
+
+    def first_page(self):
+        """Первая страница без COUNT: о продолжении судим по лишней записи."""
+        items = list(self.object_list[:self.per_page + 1])
+        page = CursorPage(
+            items[:self.per_page], self, len(items) > self.per_page, False
+        )
+        return attach_cursors(page)
+
+    def cursor_page(self, after=None, before=None):
+        """Страница записей после after либо перед before."""
+        key = decode_cursor(after or before or '')
+        if key is None:
+            return self.get_page(1)
+        if after:
+            queryset = self.after_key(*key)
+        else:
+            queryset = self.before_key(*key)
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if after:
+            page = CursorPage(items, self, has_more, True)
+        elif not has_more:
+            # Дошли до начала ленты — отдаём полноценную первую страницу
+            return self.get_page(1)
+        else:
+            items.reverse()
+            page = CursorPage(items, self, True, True)
+        return attach_cursors(page)
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии от старых к новым, листаются только курсором."""
+    date_field = 'created'
+    descending = False
+
+
+def feed_count_key(scope):
+    return f'posts:feed_count:{scope}'
+
+
+def post_scopes(post):
+    """Ленты, в которые попадает пост (кроме ленты подписок)."""
+    scopes = ['global', f'author:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def adjust_feed_counts(scopes, delta):
+    """Сдвигает закэшированные счётчики, не трогая отсутствующие."""
+    for scope in scopes:
+        try:
+            cache.incr(feed_count_key(scope), delta)
+        except ValueError:
+            # Счётчика нет в кэше — посчитается при следующем показе
+            pass
+
+
+def drop_feed_counts(scopes):
+    cache.delete_many([feed_count_key(scope) for scope in scopes])
+
+
+class FeedPaginator(CursorPaginator):
+    """CursorPaginator с кэшированным COUNT и окном номеров страниц.
+
+    scope — имя ленты ('global', 'group:<id>', 'author:<id>',
+    'follow:<user_id>'); без него count считается как обычно.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, scope=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.scope = scope
+
+    @cached_property
+    def count(self):
+        if self.scope is None:
+            return self.object_list.count()
+        key = feed_count_key(self.scope)
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.add(key, count, FEED_COUNT_TIMEOUT)
+        return count
+
+    def get_elided_page_range(self, number=1, on_each_side=PAGES_ON_EACH_SIDE,
+                              on_ends=PAGES_ON_ENDS):
+        """Номера страниц: края, окно вокруг number и многоточия."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(
+                self.num_pages - on_ends + 1, self.num_pages + 1
+            )
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def page(self, number):
+        page = super().page(number)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number)
+        )
+        return page
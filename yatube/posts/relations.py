@@ -0,0 +1,60 @@
+"""Отношения зрителя к постам и авторам страницы, одним запросом на вид.
+
+Как DataLoader: сначала собираем все id, которые понадобятся
+(want), а первый же вопрос (has) загружает всё собранное для этого
+отношения разом. Загрузчик живёт один запрос — см. for_request().
+"""
+from collections import defaultdict
+
+from .models import Comment, Follow, Like
+
+# отношение: (модель, поле зрителя, поле с id объекта)
+RELATIONS = {
+    'liked': (Like, 'user', 'post_id'),
+    'follows': (Follow, 'user', 'author_id'),
+    'commented': (Comment, 'author', 'post_id'),
+}
+
+
+class ViewerRelations:
+    def __init__(self, user):
+        self.user = user
+        self.pending = defaultdict(set)
+        self.known = defaultdict(set)
+        self.found = defaultdict(set)
+
+    def want(self, relation, ids):
+        """Запоминает id, о которых спросят позже."""
+        if relation not in RELATIONS:
+            raise KeyError(relation)
+        self.pending[relation].update(
+            pk for pk in ids if pk not in self.known[relation]
+        )
+
+    def load(self, relation):
+        ids = self.pending.pop(relation, set())
+        if not ids:
+            return
+        self.known[relation] |= ids
+        if not self.user.is_authenticated:
+            return
+        model, viewer_field, field = RELATIONS[relation]
+        self.found[relation].update(model.objects.filter(
+            **{viewer_field: self.user, f'{field}__in': ids}
+        ).values_list(field, flat=True).distinct())
+
+    def has(self, relation, pk):
+        """Связан ли зритель с объектом pk отношением relation."""
+        if pk not in self.known[relation]:
+            self.want(relation, [pk])
+            self.load(relation)
+        return pk in self.found[relation]
+
+
+def for_request(request):
+    """Загрузчик отношений текущего зрителя, один на запрос."""
+    relations = getattr(request, 'viewer_relations', None)
+    if relations is None:
+        relations = ViewerRelations(request.user)
+        request.viewer_relations = relations
+    return relations
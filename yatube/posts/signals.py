@@ -0,0 +1,214 @@
+"""Сбросы кэша и счётчики при изменении постов, лайков и подписок.
+
+Счётчики в базе меняются в той же транзакции, а кэш сбрасывается
+через after_commit: иначе другой процесс успел бы до коммита собрать
+карточку или ленту из старых данных и хранить их до конца TTL.
+"""
+from itertools import islice
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.jobs import after_commit
+
+from . import (
+    conditional, feed_cache, generations, stats, thumbnails, timeline
+)
+from .models import Comment, Follow, Group, Like, Post
+from .paginators import adjust_feed_counts, drop_feed_counts, post_scopes
+
+# Сколько постов группы сбрасывается за один запрос к кэшу
+GROUP_BATCH_SIZE = 1000
+
+
+def follower_scopes(author_id):
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    return [f'follow:{user_id}' for user_id in followers]
+
+
+def card_scopes(post_id):
+    """Области, где видна карточка поста: лента, группа, автор, сам пост."""
+    post = Post.objects.filter(pk=post_id).only('author', 'group').first()
+    if post is None:
+        return [f'post:{post_id}']
+    return post_scopes(post) + [f'post:{post_id}']
+
+
+def forget_post(post_id, scopes, *feeds):
+    """Сбрасывает карточку поста и метки областей, где она видна.
+
+    feeds — ленты, чьи поколения тоже меняются (пост в них появился
+    или пропал). Вызывается после коммита.
+    """
+    feed_cache.forget_card(post_id)
+    generations.bump(*feeds, f'post:{post_id}')
+    conditional.touch(*scopes, f'post:{post_id}')
+
+
+def post_changed(post):
+    """Сбрасывает кэши, где видна карточка поста, после его правки.
+
+    Нужна и тем, кто меняет пост через QuerySet.update() — мимо сигналов.
+    """
+    after_commit(forget_post, post.pk, post_scopes(post))
+
+
+def feeds_changed(post_id, author_id, scopes, delta):
+    """Пост появился в лентах scopes (delta=1) или пропал из них (-1)."""
+    timeline.forget_recent(author_id)
+    adjust_feed_counts(scopes, delta)
+    drop_feed_counts(follower_scopes(author_id))
+    feed_cache.forget_feeds(scopes)
+    forget_post(post_id, scopes, *scopes)
+
+
+def group_moved(moves):
+    """Пост ушёл из одной группы в другую: [(group_id, delta)]."""
+    for group_id, delta in moves:
+        adjust_feed_counts([f'group:{group_id}'], delta)
+        feed_cache.forget_feeds([f'group:{group_id}'])
+        generations.bump(f'group:{group_id}')
+        conditional.touch(f'group:{group_id}')
+
+
+def group_changed(group_id):
+    """Группу отредактировали: её название и slug видны у её постов.
+
+    Карточки постов хранят экземпляр группы, а ссылка на неё есть в
+    ленте, в профилях авторов и на страницах самих постов.
+    """
+    scopes = {'global', f'group:{group_id}'}
+    posts = Post.objects.filter(group_id=group_id).values_list(
+        'pk', 'author_id'
+    ).iterator(chunk_size=GROUP_BATCH_SIZE)
+    while True:
+        batch = list(islice(posts, GROUP_BATCH_SIZE))
+        if not batch:
+            break
+        feed_cache.forget_cards(pk for pk, _ in batch)
+        conditional.touch(*(f'post:{pk}' for pk, _ in batch))
+        scopes.update(f'author:{author_id}' for _, author_id in batch)
+    generations.bump(*scopes)
+    conditional.touch(*scopes)
+
+
+def card_changed(post_id, *feeds):
+    """Лайки или комментарии поста изменились."""
+    feed_cache.forget_card(post_id)
+    if feeds:
+        drop_feed_counts(feeds)
+    generations.bump(f'post:{post_id}', *feeds)
+    conditional.touch(*card_scopes(post_id))
+
+
+def follow_changed(user_id, author_id):
+    drop_feed_counts([f'follow:{user_id}'])
+    generations.bump(f'author:{author_id}', f'follow:{user_id}')
+    conditional.touch(f'author:{author_id}', f'author:{user_id}')
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, **kwargs):
+    # При редактировании пост может переехать в другую группу
+    instance._old_group_id = None
+    if not instance.pk:
+        return
+    old = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', 'image').first()
+    if old is None:
+        return
+    instance._old_group_id, old_image = old
+    # Новая картинка — превью старой ей не подходят
+    if (instance.image.name or '') != (old_image or ''):
+        instance.thumbnails_ready = False
+        instance.variant_width = None
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if instance.image and not instance.thumbnails_ready:
+        thumbnails.generate.delay(instance.pk)
+    if created:
+        stats.bump(instance.author_id, 'posts_count', 1)
+        timeline.fan_out.delay(instance.pk)
+        after_commit(
+            feeds_changed, instance.pk, instance.author_id,
+            post_scopes(instance), 1
+        )
+        return
+    post_changed(instance)
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id != instance.group_id:
+        after_commit(group_moved, [
+            (group_id, delta)
+            for group_id, delta in (
+                (old_group_id, -1), (instance.group_id, 1)
+            )
+            if group_id
+        ])
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'posts_count', -1)
+    after_commit(
+        feeds_changed, instance.pk, instance.author_id,
+        post_scopes(instance), -1
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if created:
+        after_commit(conditional.touch, f'group:{instance.pk}')
+    else:
+        after_commit(group_changed, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.user_id, 'following_count', 1)
+        stats.bump(instance.author_id, 'followers_count', 1)
+    if created and instance.author_id not in timeline.celebrity_ids():
+        timeline.backfill.delay(instance.user_id, instance.author_id)
+    after_commit(follow_changed, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.bump(instance.user_id, 'following_count', -1)
+    stats.bump(instance.author_id, 'followers_count', -1)
+    timeline.drop_author.delay(instance.user_id, instance.author_id)
+    after_commit(follow_changed, instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, 'likes_count', 1)
+        stats.bump_post(instance.post_id, 'likes_count', 1)
+    after_commit(card_changed, instance.post_id, f'liked:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'likes_count', -1)
+    stats.bump_post(instance.post_id, 'likes_count', -1)
+    after_commit(card_changed, instance.post_id, f'liked:{instance.user_id}')
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump_post(instance.post_id, 'comments_count', 1)
+        after_commit(card_changed, instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.bump_post(instance.post_id, 'comments_count', -1)
+    after_commit(card_changed, instance.post_id)
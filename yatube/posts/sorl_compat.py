@@ -0,0 +1,112 @@
+"""Всё, что мы берём из внутренностей sorl-thumbnail, — только здесь.
+
+Имя превью без обращения к KV-хранилищу и пакетное чтение и удаление
+записей этого хранилища sorl публично не предлагает. Мы повторяем его
+внутренний код, который проверен на версиях SUPPORTED_VERSIONS и на
+хранилище cached_db. С другой версией или другим хранилищем SUPPORTED
+ложно: превью ищутся обычным get_thumbnail(), а команды, которым нужны
+записи хранилища, отказываются работать.
+"""
+from itertools import islice
+
+import sorl
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+# Старшие версии, внутренности которых здесь повторены
+SUPPORTED_VERSIONS = ('12',)
+
+
+def supported():
+    version = getattr(sorl, '__version__', '')
+    return (
+        version.split('.')[0] in SUPPORTED_VERSIONS
+        and isinstance(default.kvstore, CachedDBStore)
+    )
+
+
+SUPPORTED = supported()
+
+
+def thumbnail_name(image, geometry, options):
+    """Имя превью в storage, как его строит get_thumbnail(), без KV."""
+    if not SUPPORTED:
+        return get_thumbnail(image, geometry, **options).name
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def lookup_many(files):
+    """Записи KV-хранилища для многих превью: {ключ: ImageFile}.
+
+    Один get_many к кэшу хранилища и один запрос к базе за промахами.
+    """
+    if not SUPPORTED:
+        return {}
+    keys = {add_prefix(thumb.key): thumb.key for thumb in files}
+    kv_cache = default.kvstore.cache
+    found = kv_cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kv_cache.set_many(rows, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(rows)
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in found.items() if isinstance(value, str)
+    }
+
+
+def forget_many(files):
+    """Удаляет записи о файлах и списки их превью одним запросом."""
+    keys = []
+    for image_file in files:
+        keys += [
+            add_prefix(image_file.key),
+            add_prefix(image_file.key, 'thumbnails'),
+        ]
+    KVStore.objects.filter(key__in=keys).delete()
+    default.kvstore.cache.delete_many(keys)
+
+
+def stored_thumbnails(images, batch_size):
+    """Имена всех превью, записанных в KV-хранилище для картинок images.
+
+    Любых геометрий и опций, а не только нынешних THUMBNAILS. Списки
+    превью исходников и записи самих превью читаются пачками.
+    """
+    names = set()
+    images = iter(images)
+    while True:
+        batch = list(islice(images, batch_size))
+        if not batch:
+            return names
+        lists = KVStore.objects.filter(key__in=[
+            add_prefix(ImageFile(image).key, 'thumbnails') for image in batch
+        ]).values_list('value', flat=True)
+        keys = [
+            add_prefix(key) for value in lists for key in deserialize(value)
+        ]
+        for start in range(0, len(keys), batch_size):
+            records = KVStore.objects.filter(
+                key__in=keys[start:start + batch_size]
+            ).values_list('value', flat=True)
+            names.update(deserialize(value)['name'] for value in records)
@@ -0,0 +1,74 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Follow, Like, Post, ProfileStats
+
+STATS_FIELDS = (
+    'posts_count', 'followers_count', 'following_count', 'likes_count'
+)
+
+
+def compute(user_id):
+    """Настоящие значения счётчиков, посчитанные по таблицам."""
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+        'likes_count': Like.objects.filter(author_id=user_id).count(),
+    }
+
+
+def get_stats(user):
+    """Строка ProfileStats пользователя; создаётся при первом показе."""
+    try:
+        return ProfileStats.objects.get(user=user)
+    except ProfileStats.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return ProfileStats.objects.create(user=user, **compute(user.pk))
+    except IntegrityError:
+        return ProfileStats.objects.get(user=user)
+
+
+def bump(user_id, field, delta):
+    """Сдвигает счётчик атомарно, без чтения строки.
+
+    Строки, которых ещё нет, не трогаем: get_stats() посчитает их целиком.
+    """
+    stats = ProfileStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        # Не уходим в минус; такой дрейф исправит check_profile_stats
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    stats.update(**{field: F(field) + delta})
+
+
+def bump_post(post_id, field, delta):
+    """То же, что bump(), для счётчиков лайков и комментариев поста."""
+    if post_id is None:
+        return
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    # Счётчики видны в карточке поста — сдвигаем и updated_at
+    posts.update(**{field: F(field) + delta, 'updated_at': timezone.now()})
+
+
+def grouped_counts(queryset, field):
+    return dict(queryset.values(field).annotate(
+        total=Count('pk')
+    ).values_list(field, 'total'))
+
+
+def actual_stats():
+    """Настоящие счётчики всех пользователей за четыре GROUP BY.
+
+    Возвращает {поле: {user_id: значение}}.
+    """
+    return {
+        'posts_count': grouped_counts(Post.objects.all(), 'author_id'),
+        'followers_count': grouped_counts(Follow.objects.all(), 'author_id'),
+        'following_count': grouped_counts(Follow.objects.all(), 'user_id'),
+        'likes_count': grouped_counts(Like.objects.all(), 'author_id'),
+    }
@@ -0,0 +1,11 @@
+from django import template
+
+from ..holes import marker
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(name, *args):
+    """Метка части страницы, которая заполняется для каждого зрителя."""
+    return marker(name, *args)
@@ -0,0 +1,32 @@
+from django import template
+
+from ..thumbnails import placeholder_size, prefetched, thumbnail
+from ..uploads import srcsets
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html', takes_context=True)
+def post_image(context, post, size='card'):
+    """Превью картинки поста или заглушка, пока превью не готовы.
+
+    Первый тег на странице одним запросом находит превью всех её
+    постов (thumbnails.prefetched), следующие берут их из запроса.
+    """
+    if not post.image:
+        return {}
+    if not post.thumbnails_ready:
+        width, height = placeholder_size(size)
+        return {'placeholder': True, 'width': width, 'height': height}
+    image = prefetched(context.get('request'), post.image, size)
+    if image is None:
+        image = thumbnail(post.image, size)
+    width, height = placeholder_size(size)
+    return {
+        'image': image,
+        'width': width,
+        'height': height,
+        # Браузер сам выберет вариант по ширине экрана и формату
+        'sources': srcsets(post.image, post.variant_width)
+        if post.variant_width else [],
+    }
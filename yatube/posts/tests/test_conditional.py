@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import conditional
+from ..models import Comment, Group, Like, Post, User
+
+
+@override_settings(JOBS_EAGER=True)
+class ConditionalGetTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_unchanged_index_is_not_modified(self):
+        """Повторный запрос без изменений — 304 без запросов в БД."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_changes_validators(self):
+        """Комментарий меняет ETag ленты и страницы поста."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        Comment.objects.create(text='Текст', author=self.user, post=self.post)
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_validators_vary_on_viewer(self):
+        """ETag одного зрителя не подходит другому."""
+        url = reverse('posts:profile', args=[self.user.username])
+        etag = self.client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_last_modified_waits_for_second_to_end(self):
+        """Last-Modified не отдаётся в ту же секунду, что и правка."""
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        start = datetime(2024, 1, 1, 12, 0, 0, 200000, tzinfo=timezone.utc)
+        clock = mock.Mock(wraps=timezone)
+        with mock.patch.object(conditional, 'timezone', clock):
+            clock.now.return_value = start
+            conditional.touch('global')
+            clock.now.return_value = start + timedelta(milliseconds=500)
+            # Правка в ту же секунду дала бы тот же Last-Modified
+            self.assertIsNone(
+                conditional.page_last_modified(request, ['global'])
+            )
+            clock.now.return_value = start + timedelta(seconds=1)
+            self.assertEqual(
+                conditional.page_last_modified(request, ['global']), start
+            )
+
+
+@override_settings(JOBS_EAGER=True)
+class AnonymousPageCacheTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Заголовок',
+            slug='the_group',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторная страница группы для анонима отдаётся из кэша."""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context)
+
+    def test_anonymous_post_detail_served_from_cache(self):
+        """Страница поста для анонима без куки и повторно из кэша."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertFalse(self.client.get(url).cookies)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertIsNone(response.context)
+        self.assertFalse(response.cookies)
+
+    def test_foreign_params_share_cache_entry(self):
+        """Чужие параметры запроса не заводят новых записей кэша."""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url + '?utm_source=x&page=')
+        self.assertIsNone(response.context)
+        response = self.client.get(url + '?page=2')
+        self.assertIsNotNone(response.context)
+
+    def test_new_post_purges_page(self):
+        """Новый пост в группе сразу виден на её странице."""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_group_edit_purges_pages_of_its_posts(self):
+        """Новый slug группы сразу виден в ленте, профиле и на посте."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed_group'
+        group.save()
+        new_url = reverse('posts:group_list', args=['renamed_group'])
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), new_url)
+
+    def test_authorized_user_bypasses_cache(self):
+        """Залогиненный пользователь получает свою страницу."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertTrue(response.context['user'].is_authenticated)
+
+
+class PageShellTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(text=f'Текст {i}', author=cls.user)
+            for i in range(5)
+        ]
+        Like.objects.create(
+            user=cls.reader, post=cls.posts[0], author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_logged_in_user_gets_shared_shell(self):
+        """Страница анонима служит основой страницы залогиненного."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        # Сессия, пользователь и по запросу лайков и комментариев
+        with self.assertNumQueries(4):
+            response = self.reader_client.get(url)
+        # Представление не вызывалось — рендерились только дырки
+        self.assertNotIn('page_obj', response.context)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(
+            response,
+            reverse('posts:post_unliked', args=[self.posts[0].pk])
+        )
+        self.assertContains(
+            response,
+            reverse('posts:post_liked', args=[self.posts[1].pk])
+        )
+
+    def test_shell_keeps_security_headers(self):
+        """Страница из общего кэша получает заголовки middleware."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.reader_client.get(url)
+        self.assertNotIn('page_obj', response.context)
+        self.assertEqual(response['X-Frame-Options'], 'SAMEORIGIN')
+
+    def test_holes_are_not_shared(self):
+        """Части страницы одного зрителя не видны другому."""
+        url = reverse('posts:profile', args=[self.user.username])
+        self.reader_client.get(url)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Пользователь: reader')
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(response, '<!--hole')
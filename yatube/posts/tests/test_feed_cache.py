@@ -0,0 +1,156 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import feed_cache, generations
+from ..models import Comment, Post, User
+from ..paginators import FeedPaginator, encode_cursor
+
+POSTS_COUNT = 25
+PER_PAGE = 10
+
+
+@override_settings(JOBS_EAGER=True)
+class FeedCacheTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(POSTS_COUNT):
+            Post.objects.create(text=f'Текст {i}', author=cls.user)
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_feed_page_needs_no_queries(self):
+        """Повторная страница ленты собирается из кэша без запросов."""
+        def page():
+            feed = feed_cache.cached_feed('global', Post.objects.for_feed())
+            return list(FeedPaginator(feed, PER_PAGE, 'global').page(2))
+
+        self.assertEqual(page(), self.ordered[PER_PAGE:2 * PER_PAGE])
+        with self.assertNumQueries(0):
+            self.assertEqual(page(), self.ordered[PER_PAGE:2 * PER_PAGE])
+
+    def test_edit_invalidates_card(self):
+        """Правка поста сбрасывает его карточку."""
+        self.client.get(reverse('posts:index'))
+        post = Post.objects.get(pk=self.ordered[0].pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            response.context['page_obj'][0].text, 'Новый текст'
+        )
+
+    @override_settings(JOBS_EAGER=False)
+    def test_invalidation_waits_for_commit(self):
+        """Кэш сбрасывается после коммита, а не внутри транзакции."""
+        post = self.ordered[0]
+        feed_cache.get_cards([(post.pub_date, post.pk)])
+        key = feed_cache.card_key(post.pk)
+        with mock.patch('core.jobs.transaction.on_commit') as on_commit:
+            Comment.objects.create(text='Текст', author=self.user, post=post)
+            # До коммита другой процесс может прочитать старую базу
+            self.assertIsNotNone(cache.get(key))
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertIsNone(cache.get(key))
+
+    def test_new_post_invalidates_ids(self):
+        """Новый пост сразу появляется в закэшированной ленте."""
+        self.client.get(reverse('posts:index'))
+        post = Post.objects.create(text='Свежий', author=self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    @mock.patch.object(feed_cache, 'FEED_IDS_LENGTH', 15)
+    def test_pages_beyond_cached_ids_fall_back_to_db(self):
+        """Страницы глубже закэшированной верхушки читаются из БД."""
+        feed = feed_cache.cached_feed('global', Post.objects.for_feed())
+        paginator = FeedPaginator(feed, PER_PAGE)
+        self.assertEqual(paginator.count, POSTS_COUNT)
+        self.assertEqual(
+            list(paginator.page(3)), self.ordered[2 * PER_PAGE:]
+        )
+        page = paginator.cursor_page(
+            after=encode_cursor(self.ordered[PER_PAGE - 1])
+        )
+        self.assertEqual(list(page), self.ordered[PER_PAGE:2 * PER_PAGE])
+        page = paginator.cursor_page(
+            before=encode_cursor(self.ordered[2 * PER_PAGE])
+        )
+        self.assertEqual(list(page), self.ordered[PER_PAGE:2 * PER_PAGE])
+
+
+@override_settings(JOBS_EAGER=True)
+class GenerationsTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_version(self):
+        """bump() меняет версию только своей области."""
+        before = generations.version(['global', 'author:1'])
+        generations.bump('author:1')
+        after = generations.version(['global', 'author:1'])
+        self.assertEqual(before.split('.')[0], after.split('.')[0])
+        self.assertNotEqual(before, after)
+
+    def test_comment_refreshes_cached_feed_fragment(self):
+        """Комментарий обновляет закэшированный фрагмент ленты."""
+        self.client.get(reverse('posts:index'))
+        Comment.objects.create(text='Текст', author=self.user, post=self.post)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class CardFragmentTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def render(self, post):
+        return render_to_string(
+            'posts/includes/main.html', {'post': post}, self.request
+        )
+
+    def test_card_is_keyed_by_updated_at(self):
+        """Карточка перерисовывается, только когда сдвинулся updated_at."""
+        post = Post.objects.get(pk=self.post.pk)
+        self.render(post)
+        post.text = 'Новый текст'
+        self.assertNotIn('Новый текст', self.render(post))
+        post.save()
+        self.assertIn('Новый текст', self.render(post))
+
+    def test_counters_touch_updated_at(self):
+        """Лайки и комментарии сдвигают updated_at поста."""
+        before = Post.objects.get(pk=self.post.pk).updated_at
+        Comment.objects.create(text='Текст', author=self.user, post=self.post)
+        self.assertGreater(
+            Post.objects.get(pk=self.post.pk).updated_at, before
+        )
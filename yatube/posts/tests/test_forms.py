@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -16,6 +17,8 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostsFormTest(TestCase):
+    databases = {'default', 'cache'}
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -168,13 +171,16 @@ class PostsFormTest(TestCase):
         )
         # Проверяем, сработал ли редирект создания поста
         self.assertRedirects(response, '/profile/test_name_1/')
+        # Картинка хранится под хэшем содержимого, по подкаталогам
+        digest = hashlib.sha256(small_gif).hexdigest()
+        stored_name = f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         # Проверяем, сработал ли редирект редактирования поста
         self.assertEqual(Post.objects.count(), posts_count + 1)
         self.assertTrue(
             Post.objects.filter(
                 group=self.group.id,
                 text=form_data['text'],
-                image=f'posts/{uploaded.name}',
+                image=stored_name,
             ).exists()
         )
         # Проверка контекста
@@ -184,7 +190,7 @@ class PostsFormTest(TestCase):
         response_test_3 = response_1.image
         self.assertEqual(response_test_1, form_data['text'])
         self.assertEqual(response_test_2, form_data['group'])
-        self.assertEqual(response_test_3, f'posts/{uploaded.name}')
+        self.assertEqual(response_test_3, stored_name)
 
     def test_edit_image_post(self):
         """Проверка страницы редактирования вместе с картинками."""
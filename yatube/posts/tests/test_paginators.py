@@ -0,0 +1,162 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+from ..paginators import (
+    CursorPaginator, FeedPaginator, encode_cursor, feed_count_key
+)
+
+POSTS_COUNT = 25
+PER_PAGE = 10
+
+
+class CursorPaginatorTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Текст {i}', author=cls.user)
+            for i in range(POSTS_COUNT)
+        )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cursor_pages_match_offset_pages(self):
+        """Проход по курсорам даёт те же страницы, что и по номерам."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        page = paginator.get_page(1)
+        seen = list(page)
+        while page.has_next():
+            page = paginator.cursor_page(after=page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, self.ordered)
+
+    def test_before_cursor_returns_newer_posts(self):
+        """?before= отдаёт предыдущую страницу в прежнем порядке."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        page = paginator.cursor_page(
+            before=encode_cursor(self.ordered[2 * PER_PAGE])
+        )
+        self.assertTrue(page.is_cursor)
+        self.assertEqual(
+            list(page), self.ordered[PER_PAGE:2 * PER_PAGE]
+        )
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный токен не ломает страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?after=garbage'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), self.ordered[:PER_PAGE]
+        )
+
+    def test_index_cursor_navigation(self):
+        """Главная страница отдаёт следующую страницу по курсору."""
+        cursor = encode_cursor(self.ordered[PER_PAGE - 1])
+        response = self.guest_client.get(
+            reverse('posts:index') + f'?after={cursor}'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.ordered[PER_PAGE:2 * PER_PAGE]
+        )
+
+
+@override_settings(JOBS_EAGER=True)
+class FeedPaginatorTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Заголовок',
+            slug='the_group',
+            description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached(self):
+        """Повторный показ ленты не выполняет COUNT."""
+        Post.objects.create(text='Текст', author=self.user)
+        FeedPaginator(Post.objects.all(), PER_PAGE, 'global').count
+        paginator = FeedPaginator(Post.objects.all(), PER_PAGE, 'global')
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 1)
+
+    def test_count_follows_post_changes(self):
+        """Создание и удаление постов сдвигают закэшированный счётчик."""
+        cache.set(feed_count_key(f'group:{self.group.pk}'), 0)
+        post = Post.objects.create(
+            text='Текст', author=self.user, group=self.group
+        )
+        self.assertEqual(
+            cache.get(feed_count_key(f'group:{self.group.pk}')), 1
+        )
+        post.delete()
+        self.assertEqual(
+            cache.get(feed_count_key(f'group:{self.group.pk}')), 0
+        )
+
+    def test_elided_page_range(self):
+        """Панель страниц не перечисляет все номера."""
+        cache.set(feed_count_key('global'), 1000 * PER_PAGE)
+        paginator = FeedPaginator(Post.objects.all(), PER_PAGE, 'global')
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(500)),
+            [1, ellipsis, 497, 498, 499, 500, 501, 502, 503, ellipsis, 1000]
+        )
+
+
+COMMENTS_COUNT = 45
+COMMENTS_PER_PAGE = 20
+
+
+class CommentPaginationTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {i}', author=cls.user, post=cls.post)
+            for i in range(COMMENTS_COUNT)
+        )
+        cls.ordered = list(cls.post.comments.order_by('created', 'pk'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_batch(self):
+        """На странице поста только первая пачка комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.ordered[:COMMENTS_PER_PAGE])
+        self.assertTrue(comments.has_next())
+
+    def test_fragment_walks_all_comments(self):
+        """Фрагмент отдаёт следующие пачки до конца."""
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        response = self.client.get(url)
+        seen = list(response.context['comments'])
+        while response.context['comments'].has_next():
+            cursor = response.context['comments'].next_cursor
+            response = self.client.get(f'{url}?after={cursor}')
+            seen.extend(response.context['comments'])
+        self.assertEqual(seen, self.ordered)
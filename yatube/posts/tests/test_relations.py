@@ -0,0 +1,46 @@
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+
+from ..models import Comment, Follow, Like, Post, User
+from ..relations import ViewerRelations
+
+
+class ViewerRelationsTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(text=f'Текст {i}', author=cls.author)
+            for i in range(5)
+        ]
+        Like.objects.create(
+            user=cls.reader, post=cls.posts[0], author=cls.author
+        )
+        Comment.objects.create(
+            text='Текст', author=cls.reader, post=cls.posts[1]
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_one_query_per_relation(self):
+        """Все посты страницы проверяются одним запросом на отношение."""
+        relations = ViewerRelations(self.reader)
+        pks = [post.pk for post in self.posts]
+        relations.want('liked', pks)
+        relations.want('commented', pks)
+        with self.assertNumQueries(2):
+            liked = [relations.has('liked', pk) for pk in pks]
+            commented = [relations.has('commented', pk) for pk in pks]
+        self.assertEqual(liked, [True, False, False, False, False])
+        self.assertEqual(commented, [False, True, False, False, False])
+        with self.assertNumQueries(1):
+            self.assertTrue(relations.has('follows', self.author.pk))
+
+    def test_anonymous_viewer_needs_no_queries(self):
+        """У анонима отношений нет, и запросов тоже."""
+        relations = ViewerRelations(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertFalse(relations.has('liked', self.posts[0].pk))
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import feed_cache
+from ..models import Comment, Follow, Post, ProfileStats, User
+from ..stats import get_stats
+
+
+class ProfileStatsTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def test_stats_are_computed_on_first_access(self):
+        """Первый показ профиля считает счётчики по таблицам."""
+        Post.objects.create(text='Текст', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        stats = get_stats(self.author)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+
+    def test_stats_follow_writes(self):
+        """Создание и удаление постов и подписок двигают счётчики."""
+        get_stats(self.author)
+        get_stats(self.reader)
+        post = Post.objects.create(text='Текст', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        author_stats = ProfileStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.reader).following_count, 1
+        )
+        post.delete()
+        follow.delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+
+    def test_check_command_repairs_drift(self):
+        """check_profile_stats --repair исправляет расхождения."""
+        Post.objects.create(text='Текст', author=self.author)
+        ProfileStats.objects.create(user=self.author, posts_count=7)
+        call_command('check_profile_stats', '--repair', stdout=StringIO())
+        self.assertEqual(get_stats(self.author).posts_count, 1)
+
+
+@override_settings(JOBS_EAGER=True)
+class PostCountersTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Текст', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_like_and_comment_update_counters(self):
+        """Лайк, дизлайк и комментарий двигают счётчики поста."""
+        self.client.get(reverse('posts:post_liked', args=[self.post.pk]))
+        self.client.get(reverse('posts:post_liked', args=[self.post.pk]))
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            data={'text': 'Комментарий'}
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+        self.client.get(reverse('posts:post_unliked', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_edit_keeps_counters(self):
+        """Сохранение поста не затирает счётчики старыми значениями."""
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(text='Текст', author=self.reader, post=stale)
+        stale.text = 'Новый текст'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_recount_command(self):
+        """recount_post_counters восстанавливает счётчики."""
+        Comment.objects.create(
+            text='Текст', author=self.reader, post=self.post
+        )
+        Post.objects.filter(pk=self.post.pk).update(comments_count=5)
+        post = Post.objects.get(pk=self.post.pk)
+        feed_cache.get_cards([(post.pub_date, post.pk)])
+        call_command('recount_post_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        # Карточка в кэше хранила неверный счётчик — её больше нет
+        card, = feed_cache.get_cards([(post.pub_date, post.pk)])
+        self.assertEqual(card.comments_count, 1)
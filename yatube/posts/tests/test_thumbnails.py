@@ -0,0 +1,196 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from core.jobs import run_next
+from core.models import Job
+
+from .. import sorl_compat, thumbnails
+from ..models import Post, User
+from ..templatetags.post_images import post_image
+from ..thumbnails import (
+    THUMBNAILS, defer_prefetch, generate, prefetch, thumbnail, thumbnail_file
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, JOBS_EAGER=True)
+class ThumbnailsTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def upload(self, name='small.gif'):
+        return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+    def test_thumbnails_ready_after_upload(self):
+        """Все превью создаются сразу при сохранении картинки."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=self.upload()
+        )
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        for size in THUMBNAILS:
+            self.assertTrue(thumbnail(post.image, size).exists())
+
+    def test_new_image_resets_ready(self):
+        """Замена картинки сбрасывает готовность превью."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image='posts/missing.gif'
+        )
+        post.refresh_from_db()
+        # Файла нет — превью не создать, остаётся заглушка
+        self.assertFalse(post.thumbnails_ready)
+        self.assertIn('placeholder', post_image({}, post))
+        post.image = self.upload('other.gif')
+        post.save()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertIn('image', post_image({}, post))
+
+    def test_page_shows_placeholder(self):
+        """Пока превью не готовы, страница не режет картинку сама."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image='posts/missing.gif'
+        )
+        response = Client().get(f'/posts/{post.pk}/')
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+
+    def test_generate_skips_post_without_image(self):
+        post = Post.objects.create(text='Текст', author=self.user)
+        generate(post.pk)
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnails_ready)
+
+    def test_failed_build_is_retried(self):
+        """Сбой при живом оригинале ставит задачу на повтор."""
+        with mock.patch.object(thumbnails, 'build', return_value=False):
+            post = Post.objects.create(
+                text='Текст', author=self.user, image=self.upload()
+            )
+        retry = Job.objects.get(name=generate.job_name)
+        self.assertEqual((retry.status, retry.attempts), (Job.QUEUED, 1))
+        self.assertIn('ThumbnailError', retry.last_error)
+        Job.objects.update(run_at=timezone.now())
+        run_next('test')
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_missing_image_is_not_retried(self):
+        """Без оригинала повторять нечего — задача не ставится."""
+        Post.objects.create(
+            text='Текст', author=self.user, image='posts/missing.gif'
+        )
+        self.assertFalse(Job.objects.exists())
+
+    def test_prefetch_page_in_one_query(self):
+        """Превью всей страницы находятся одним запросом к базе."""
+        posts = [
+            Post.objects.create(
+                text='Текст', author=self.user, image=self.upload()
+            ) for _ in range(3)
+        ]
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(
+                thumbnail_file(post.image).name, thumbnail(post.image).name
+            )
+        cache.clear()
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(1):
+            prefetch(request, posts)
+        for post in posts:
+            self.assertIn((post.image.name, 'card'), request.thumbnails)
+        # Тег берёт превью из request, KV-хранилище больше не нужно
+        with self.assertNumQueries(0):
+            context = post_image({'request': request}, posts[0])
+        self.assertEqual(
+            context['image'].url, thumbnail(posts[0].image).url
+        )
+
+    def test_prefetch_waits_for_first_tag(self):
+        """Превью страницы ищутся только тогда, когда их выводит тег."""
+        posts = [
+            Post.objects.create(
+                text='Текст', author=self.user, image=self.upload()
+            ) for _ in range(2)
+        ]
+        for post in posts:
+            post.refresh_from_db()
+        cache.clear()
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(0):
+            defer_prefetch(request, posts)
+        with self.assertNumQueries(1):
+            post_image({'request': request}, posts[0])
+        with self.assertNumQueries(0):
+            context = post_image({'request': request}, posts[1])
+        self.assertEqual(
+            context['image'].url, thumbnail(posts[1].image).url
+        )
+
+    def test_unsupported_sorl_falls_back(self):
+        """С непроверенной версией sorl превью берутся через get_thumbnail."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=self.upload()
+        )
+        post.refresh_from_db()
+        request = RequestFactory().get('/')
+        with mock.patch.object(sorl_compat, 'SUPPORTED', False):
+            defer_prefetch(request, [post])
+            context = post_image({'request': request}, post)
+            self.assertEqual(
+                thumbnail_file(post.image).name, thumbnail(post.image).name
+            )
+            with self.assertRaises(CommandError):
+                call_command('gc_media', stdout=StringIO())
+        self.assertEqual(context['image'].url, thumbnail(post.image).url)
+
+    def test_rebuild_thumbnails_command(self):
+        """Команда создаёт недостающие превью и продолжает с отметки."""
+        posts = [
+            Post.objects.create(
+                text='Текст', author=self.user, image=self.upload()
+            ) for _ in range(3)
+        ]
+        Post.objects.update(thumbnails_ready=False)
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+        with open(checkpoint, 'w') as file:
+            file.write(str(posts[0].pk))
+        call_command(
+            'rebuild_thumbnails', processes=0, batch_size=1,
+            checkpoint=checkpoint, stdout=StringIO()
+        )
+        ready = dict(Post.objects.values_list('pk', 'thumbnails_ready'))
+        self.assertEqual(
+            ready, {posts[0].pk: False, posts[1].pk: True, posts[2].pk: True}
+        )
+        # Проход завершён — отметка удалена
+        self.assertFalse(os.path.exists(checkpoint))
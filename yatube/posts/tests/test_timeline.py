@@ -0,0 +1,165 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import jobs
+
+from .. import timeline
+from ..models import Follow, Post, Timeline, User
+
+
+@override_settings(JOBS_EAGER=True)
+class TimelineTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+
+    def test_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        self.assertIn(post, timeline.feed(self.reader))
+
+    def test_follow_backfills_and_unfollow_drops(self):
+        """Подписка подтягивает старые посты, отписка их убирает."""
+        post = Post.objects.create(text='Текст', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertIn(post, timeline.feed(self.reader))
+        follow.delete()
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    @mock.patch.object(timeline, 'TIMELINE_LENGTH', 3)
+    def test_timeline_is_capped(self):
+        """Лента не растёт больше TIMELINE_LENGTH."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(5):
+            Post.objects.create(text=f'Текст {i}', author=self.author)
+        self.assertEqual(Timeline.objects.filter(user=self.reader).count(), 3)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Текст', author=self.author)
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=mock.MagicMock())
+        self.assertIn(post, timeline.feed(self.reader))
+
+    @override_settings(JOBS_EAGER=False)
+    def test_follow_count_refreshed_by_worker(self):
+        """Счётчик ленты сбрасывается, когда воркер заполнил Timeline."""
+        for i in range(3):
+            Post.objects.create(text=f'Текст {i}', author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:follow_index')
+
+        def commit(on_commit):
+            callbacks = [call[0][0] for call in on_commit.call_args_list]
+            on_commit.reset_mock()
+            for callback in callbacks:
+                callback()
+
+        with mock.patch('core.jobs.transaction.on_commit') as on_commit:
+            client.get(
+                reverse('posts:profile_follow', args=[self.author.username])
+            )
+            commit(on_commit)
+            # Воркер ещё не запускался: лента пуста, и это число в кэше
+            page = client.get(url).context['page_obj']
+            self.assertEqual(page.paginator.count, 0)
+            jobs.run_next('test')
+            commit(on_commit)
+        response = client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_feed_pages_timeline_by_index(self):
+        """Страница ленты — срез Timeline по индексу и карточки из кэша."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Текст {i}', author=self.author)
+            for i in range(3)
+        ]
+        cache.clear()
+        feed = timeline.feed(self.reader)
+        self.assertIsInstance(feed, timeline.TimelineFeed)
+        plan = feed.rows.explain()
+        self.assertIn('timeline_user_feed_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        # Срез Timeline и добор промахов кэша карточек
+        with self.assertNumQueries(2):
+            self.assertEqual(feed[:2], posts[:0:-1])
+        with self.assertNumQueries(1):
+            self.assertEqual(feed[:2], posts[:0:-1])
+        older = feed.older(posts[1].pub_date, posts[1].pk)
+        self.assertEqual(older[:10], [posts[0]])
+
+
+@override_settings(JOBS_EAGER=True)
+class MergedFeedTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(12):
+            Post.objects.create(
+                text=f'Текст {i}', author=cls.authors[i % 3]
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_merged_feed_matches_timeline(self):
+        """Слияние при чтении даёт ту же ленту, что и Timeline."""
+        author_ids = {author.pk for author in self.authors}
+        merged = timeline.MergedFeed.for_authors(author_ids)
+        expected = list(
+            Post.objects.filter(timeline__user=self.reader).order_by(
+                '-pub_date', '-pk'
+            )
+        )
+        self.assertEqual(merged[:len(merged)], expected)
+
+    @mock.patch.object(timeline, 'AUTHOR_RECENT_LENGTH', 2)
+    def test_author_recent_reads_bounded_slices(self):
+        """Промахи кэша читаются срезом на автора, а не всеми постами."""
+        author_ids = {author.pk for author in self.authors}
+        with CaptureQueriesContext(connection) as queries:
+            recent = timeline.author_recent(author_ids)
+        self.assertEqual(len(queries), len(author_ids))
+        for query in queries:
+            self.assertIn('LIMIT 2', query['sql'])
+        self.assertEqual(sorted(map(len, recent)), [2, 2, 2])
+        with self.assertNumQueries(0):
+            self.assertEqual(timeline.author_recent(author_ids), recent)
+
+    @mock.patch.object(timeline, 'HEAVY_FOLLOWING', 3)
+    def test_follow_index_uses_merged_feed(self):
+        """Читатель с многими подписками получает ленту слиянием."""
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index'))
+        page = response.context['page_obj']
+        self.assertIsInstance(page.paginator.object_list, timeline.MergedFeed)
+        self.assertEqual(len(page), 10)
+        response = client.get(
+            reverse('posts:follow_index') + f'?after={page.next_cursor}'
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
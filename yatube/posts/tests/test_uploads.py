@@ -0,0 +1,176 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from core.storage import SHARDED_RE
+
+from .. import conditional, generations, thumbnails
+from ..forms import PostForm
+from ..management.commands import gc_media
+from ..models import Post, User
+from ..templatetags.post_images import post_image
+from ..thumbnails import thumbnail_file
+from ..uploads import MAX_EDGE, VARIANT_FORMATS, variant_name
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(size, name='photo.jpg', **save_options):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', **save_options)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, JOBS_EAGER=True)
+class UploadsTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def clean(self, upload):
+        form = PostForm(data={'text': 'Текст'}, files={'image': upload})
+        return form, form.is_valid()
+
+    def test_large_photo_is_downsized_without_exif(self):
+        """Большое фото уменьшается до MAX_EDGE и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        form, valid = self.clean(
+            make_upload((MAX_EDGE * 2, MAX_EDGE), exif=exif.tobytes())
+        )
+        self.assertTrue(valid, form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (MAX_EDGE, MAX_EDGE // 2))
+            self.assertNotIn('exif', image.info)
+
+    @mock.patch('posts.uploads.MAX_PIXELS', 100)
+    def test_decompression_bomb_rejected(self):
+        """Слишком много пикселей — ошибка формы, а не декодирование."""
+        form, valid = self.clean(make_upload((20, 20)))
+        self.assertFalse(valid)
+        self.assertIn('image', form.errors)
+
+    def test_variants_and_srcset(self):
+        """Фоновая задача сохраняет варианты, шаблон получает srcset."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_upload((1000, 500))
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.variant_width, 1000)
+        storage = post.image.storage
+        for width in (480, 1000):
+            for extension, *_ in VARIANT_FORMATS:
+                self.assertTrue(storage.exists(
+                    variant_name(post.image.name, width, extension)
+                ))
+        sources = post_image({}, post)['sources']
+        self.assertEqual(
+            [mime for mime, _ in sources],
+            [mime for _, _, mime, _ in VARIANT_FORMATS]
+        )
+        self.assertIn('1000w', sources[-1][1])
+
+    def test_shard_media_moves_flat_files(self):
+        """Команда переносит плоские картинки в подкаталоги хэша."""
+        default_storage.save('posts/old.jpg', make_upload((10, 10)))
+        post = Post.objects.create(
+            text='Текст', author=self.user, image='posts/old.jpg'
+        )
+        missing = Post.objects.create(
+            text='Текст', author=self.user, image='posts/missing.jpg'
+        )
+        for _ in range(2):
+            # Повторный запуск ничего не ломает
+            call_command(
+                'shard_media', stdout=StringIO(), stderr=StringIO()
+            )
+        post.refresh_from_db()
+        self.assertTrue(SHARDED_RE.search(post.image.name))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertTrue(post.thumbnails_ready)
+        missing.refresh_from_db()
+        self.assertEqual(missing.image.name, 'posts/missing.jpg')
+
+    def test_shard_media_invalidates_cached_pages(self):
+        """После переноса кэш страниц поста не ссылается на старое имя."""
+        default_storage.save('posts/old.jpg', make_upload((10, 10)))
+        post = Post.objects.create(
+            text='Текст', author=self.user, image='posts/old.jpg'
+        )
+        scopes = [f'post:{post.pk}', f'author:{self.user.pk}']
+        before = generations.get_generations(scopes[:1])
+        stamp = conditional.last_modified(scopes)
+        # Без задачи превью: ей post_save и так сбросил бы кэш
+        with mock.patch.object(thumbnails.generate, 'delay'):
+            call_command('shard_media', stdout=StringIO())
+        self.assertNotEqual(generations.get_generations(scopes[:1]), before)
+        self.assertGreater(conditional.last_modified(scopes), stamp)
+
+    def test_gc_media_removes_only_orphans(self):
+        """gc_media убирает файлы без постов и оставляет нужные."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_upload((600, 300))
+        )
+        post.refresh_from_db()
+        live = [
+            post.image.name,
+            variant_name(post.image.name, 480, 'jpg'),
+            thumbnail_file(post.image).name,
+        ]
+        orphans = [
+            default_storage.save('posts/deleted.jpg', make_upload((5, 5))),
+            variant_name('posts/ab/cd/deleted.jpg', 480, 'jpg'),
+            'cache/00/11/old-geometry.jpg',
+        ]
+        for name in orphans[1:]:
+            default_storage.save(name, make_upload((5, 5)))
+        call_command(
+            'gc_media', dry_run=True, min_age=0, stdout=StringIO()
+        )
+        self.assertTrue(all(map(default_storage.exists, orphans)))
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        self.assertFalse(any(map(default_storage.exists, orphans)))
+        self.assertTrue(all(map(default_storage.exists, live)))
+
+    def test_gc_media_rechecks_batch_before_delete(self):
+        """Сирота, ставший картинкой поста во время прохода, остаётся."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_upload((600, 300))
+        )
+        post.refresh_from_db()
+        live = [post.image.name, variant_name(post.image.name, 480, 'jpg')]
+        # Проход начался до появления поста: живых имён у него нет
+        nothing = (set(), set(), set())
+        with mock.patch.object(gc_media, 'live_names', return_value=nothing):
+            call_command('gc_media', min_age=0, stdout=StringIO())
+        self.assertTrue(all(map(default_storage.exists, live)))
+
+    def test_gc_media_keeps_thumbnails_from_kvstore(self):
+        """Превью другой геометрии с записью в KV-хранилище не удаляется."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_upload((600, 300))
+        )
+        post.refresh_from_db()
+        other = get_thumbnail(post.image, '100x100')
+        self.assertNotEqual(other.name, thumbnail_file(post.image).name)
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        self.assertTrue(default_storage.exists(other.name))
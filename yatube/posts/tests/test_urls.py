@@ -7,6 +7,8 @@ from ..models import Post, Group, User
 
 
 class StaticURLTests(TestCase):
+    databases = {'default', 'cache'}
+
     """Проверка доступности стартовой страницы"""
     def test_homepage(self):
         guest_client = Client()
@@ -15,6 +17,8 @@ class StaticURLTests(TestCase):
 
 
 class PostsURLTests(TestCase):
+    databases = {'default', 'cache'}
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
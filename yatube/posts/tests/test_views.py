@@ -1,11 +1,17 @@
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
 from ..models import Post, Group, User, Comment, Follow
+from ..stats import get_stats
 
 
 class PostsViewTest(TestCase):
+    databases = {'default', 'cache'}
+
     @classmethod
     def setUpClass(cls) -> None:
         super().setUpClass()
@@ -36,6 +42,7 @@ class PostsViewTest(TestCase):
         ]
 
     def setUp(self):
+        cache.clear()
         # Создаем неавторизованный клиент
         self.guest_client = Client()
         # Создаем авторизованый клиент
@@ -193,7 +200,10 @@ POSTS_ON_FIRST_PAGE = 10
 POSTS_ON_SECOND_PAGE = 3
 
 
+@override_settings(JOBS_EAGER=True)
 class PaginatorViewsTest(TestCase):
+    databases = {'default', 'cache'}
+
     @classmethod
     def setUpClass(cls) -> None:
         super().setUpClass()
@@ -290,7 +300,10 @@ class PaginatorViewsTest(TestCase):
         )
 
 
+@override_settings(JOBS_EAGER=True)
 class FollowViewsTest(TestCase):
+    databases = {'default', 'cache'}
+
     @classmethod
     def setUpClass(cls) -> None:
         super().setUpClass()
@@ -368,3 +381,42 @@ class FollowViewsTest(TestCase):
         )
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertTrue(post not in response.context['page_obj'].object_list)
+
+
+class FeedQueriesTest(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title="Заголовок",
+            slug="the_group",
+            description="Описание"
+        )
+        cls.author = User.objects.create_user(username='test_name_2')
+        get_stats(cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_grow_with_posts(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'the_group'}),
+            reverse('posts:profile', kwargs={'username': 'test_name_2'}),
+        ]
+        Post.objects.create(text='Текст', author=self.author, group=self.group)
+        single = [self.count_queries(url) for url in urls]
+        for _ in range(9):
+            Post.objects.create(
+                text='Текст', author=self.author, group=self.group
+            )
+        self.assertEqual([self.count_queries(url) for url in urls], single)
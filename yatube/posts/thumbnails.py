@@ -0,0 +1,139 @@
+"""Превью картинок постов: нужные размеры и их подготовка вне запроса.
+
+Как только у поста сохранена картинка, задача generate() создаёт все
+размеры из THUMBNAILS и отмечает Post.thumbnails_ready. До этого
+шаблоны показывают заглушку, а не режут картинку в запросе читателя.
+
+Вместе с превью создаются варианты размеров для srcset (uploads).
+
+Для страницы ленты первый {% post_image %} находит все готовые превью
+одним запросом к KV-хранилищу sorl (prefetch), остальные берут их из
+запроса. Внутренности sorl, нужные для этого, — в sorl_compat.
+"""
+from django.core.exceptions import SuspiciousFileOperation
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.jobs import job
+
+from . import sorl_compat, uploads
+from .models import Post
+
+# Все размеры, которые выводят шаблоны: имя -> (геометрия, опции sorl)
+THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+
+class ThumbnailError(Exception):
+    """Превью картинки, которая есть в storage, не удалось создать."""
+
+
+def thumbnail(image, size='card'):
+    geometry, options = THUMBNAILS[size]
+    return get_thumbnail(image, geometry, **options)
+
+
+def thumbnail_file(image, size='card'):
+    """Превью без обращения к KV-хранилищу: только его имя в storage."""
+    geometry, options = THUMBNAILS[size]
+    return ImageFile(
+        sorl_compat.thumbnail_name(image, geometry, options), default.storage
+    )
+
+
+def prefetch(request, posts, sizes=('card',)):
+    """Готовые превью страницы постов в request.thumbnails."""
+    if not sorl_compat.SUPPORTED:
+        return
+    files = {
+        (post.image.name, size): thumbnail_file(post.image, size)
+        for post in posts if post.image and post.thumbnails_ready
+        for size in sizes
+    }
+    if not files:
+        return
+    stored = sorl_compat.lookup_many(files.values())
+    prefetched = getattr(request, 'thumbnails', {})
+    for name, thumb in files.items():
+        if thumb.key in stored:
+            prefetched[name] = stored[thumb.key]
+    request.thumbnails = prefetched
+
+
+def defer_prefetch(request, posts):
+    """Запоминает страницу постов; превью найдёт первый {% post_image %}.
+
+    Если страница целиком или фрагменты карточек взяты из кэша, теги не
+    вызываются — и к KV-хранилищу никто не обращается.
+    """
+    request.thumbnail_posts = posts
+
+
+def prefetched(request, image, size='card'):
+    """Превью из request.thumbnails или None; догружает отложенную страницу."""
+    if request is None:
+        return None
+    posts = getattr(request, 'thumbnail_posts', None)
+    if posts is not None:
+        request.thumbnail_posts = None
+        prefetch(request, posts)
+    return getattr(request, 'thumbnails', {}).get((image.name, size))
+
+
+def placeholder_size(size='card'):
+    """Ширина и высота заглушки — те же пропорции, что у превью."""
+    width, height = THUMBNAILS[size][0].split('x')
+    return int(width), int(height)
+
+
+def build(post, force=False):
+    """Создаёт превью и варианты картинки поста; True, если все на месте.
+
+    С force старые превью удаляются вместе с записями KV-хранилища —
+    например, после переезда на другой storage.
+    """
+    if force:
+        for size in THUMBNAILS:
+            thumb = thumbnail_file(post.image, size)
+            default.kvstore.delete(thumb, delete_thumbnails=False)
+            if thumb.exists():
+                thumb.delete()
+    post.variant_width = uploads.build_variants(post.image, force)
+    if post.variant_width is None:
+        return False
+    # sorl не бросает исключений на битый или пропавший файл — он просто
+    # не создаёт превью; такую картинку оставляем с заглушкой
+    return all(thumbnail(post.image, size).exists() for size in THUMBNAILS)
+
+
+def mark_ready(post):
+    post.thumbnails_ready = True
+    # updated_at сдвигается — карточки перерисуются уже с картинкой
+    post.save(
+        update_fields=['thumbnails_ready', 'variant_width', 'updated_at']
+    )
+
+
+def source_exists(image):
+    try:
+        return image.storage.exists(image.name)
+    except SuspiciousFileOperation:
+        return False
+
+
+@job()
+def generate(post_id):
+    """Задача: создаёт все превью картинки поста.
+
+    Если оригинал на месте, а превью не получились, это, скорее всего,
+    временный сбой storage: задача падает, и очередь повторит её с
+    паузой, пока не кончатся попытки. Без оригинала повторять нечего.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image or post.thumbnails_ready:
+        return
+    if build(post):
+        mark_ready(post)
+    elif source_exists(post.image):
+        raise ThumbnailError(f'Нет превью для {post.image.name}')
@@ -0,0 +1,247 @@
+import heapq
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from core.jobs import PRIORITY_HIGH, after_commit, job
+from core.stampede import single_flight
+
+from .feed_cache import EntryFeed, get_cards
+from .models import Follow, Post, Timeline
+from .paginators import FEED_ORDERING, drop_feed_counts
+
+# Сколько последних постов хранится в ленте подписок одного читателя
+TIMELINE_LENGTH = 1000
+# Сколько последних постов автора держим в кэше для fan-out on read
+AUTHOR_RECENT_LENGTH = 200
+AUTHOR_RECENT_TIMEOUT = 60 * 60
+# Посты авторов с таким числом подписчиков не раздаются при записи
+CELEBRITY_FOLLOWERS = 10000
+CELEBRITY_TIMEOUT = 60 * 5
+# Читатели с таким числом подписок собирают ленту при чтении
+HEAVY_FOLLOWING = 500
+
+
+def timelines_changed(user_ids):
+    """Строки Timeline читателей изменились — их счётчики лент устарели.
+
+    Сброс после коммита: иначе читатель успел бы посчитать старые строки
+    и хранить это число, обрезая по нему страницы ленты.
+    """
+    after_commit(
+        drop_feed_counts, [f'follow:{user_id}' for user_id in user_ids]
+    )
+
+
+def trim(user_id):
+    """Обрезает ленту читателя до TIMELINE_LENGTH записей.
+
+    Счётчик ленты сбрасывает вызывающий (timelines_changed).
+    """
+    edge = Timeline.objects.filter(user_id=user_id).order_by(
+        '-pub_date', '-post_id'
+    ).values_list('pub_date', 'post_id')[TIMELINE_LENGTH:TIMELINE_LENGTH + 1]
+    edge = list(edge)
+    if not edge:
+        return
+    pub_date, post_id = edge[0]
+    Timeline.objects.filter(user_id=user_id).filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, post_id__lte=post_id)
+    ).delete()
+
+
+def fill(user_id, posts):
+    """Кладёт посты (пары pk, pub_date) в ленту читателя."""
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+@job(priority=PRIORITY_HIGH)
+def fan_out(post_id):
+    """Задача: раздаёт пост подписчикам, если его ещё не удалили."""
+    post = Post.objects.filter(pk=post_id).only(
+        'author', 'pub_date'
+    ).first()
+    if post is not None:
+        push(post)
+
+
+def push(post):
+    """Fan-out on write: раздаёт новый пост подписчикам автора."""
+    if post.author_id in celebrity_ids():
+        return
+    followers = set(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    with transaction.atomic():
+        Timeline.objects.bulk_create(
+            [
+                Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+                for user_id in followers
+            ],
+            ignore_conflicts=True,
+        )
+        for user_id in followers:
+            trim(user_id)
+    timelines_changed(followers)
+
+
+@job(priority=PRIORITY_HIGH)
+@transaction.atomic
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if not Follow.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).exists():
+        # Пока задача ждала очереди, читатель успел отписаться
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        *FEED_ORDERING
+    ).values_list('pk', 'pub_date')[:TIMELINE_LENGTH]
+    fill(user_id, posts)
+    trim(user_id)
+    timelines_changed([user_id])
+
+
+@job()
+def drop_author(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        return
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+    timelines_changed([user_id])
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Собирает ленту читателя заново по текущим подпискам."""
+    Timeline.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).distinct().order_by(*FEED_ORDERING).values_list(
+        'pk', 'pub_date'
+    )[:TIMELINE_LENGTH]
+    fill(user_id, posts)
+    timelines_changed([user_id])
+
+
+@single_flight('posts:celebrities', CELEBRITY_TIMEOUT)
+def celebrity_ids():
+    """Авторы, чьи посты собираются только при чтении."""
+    return set(Follow.objects.values('author_id').annotate(
+        followers=Count('user_id', distinct=True)
+    ).filter(
+        followers__gte=CELEBRITY_FOLLOWERS
+    ).values_list('author_id', flat=True))
+
+
+def recent_key(author_id):
+    return f'posts:recent:{author_id}'
+
+
+def author_recent(author_ids):
+    """Последние (pub_date, pk) постов каждого автора, из кэша или БД.
+
+    Промахи кэша читаются срезом [:AUTHOR_RECENT_LENGTH] на автора по
+    индексу post_author_feed_idx: запросов столько же, сколько холодных
+    авторов, но каждый ограничен, а не читает все их посты. Результаты
+    кладутся в кэш одним set_many.
+    """
+    keys = {recent_key(author_id): author_id for author_id in author_ids}
+    cached = cache.get_many(keys)
+    fetched = {
+        key: list(Post.objects.filter(author_id=author_id).order_by(
+            *FEED_ORDERING
+        ).values_list('pub_date', 'pk')[:AUTHOR_RECENT_LENGTH])
+        for key, author_id in keys.items() if key not in cached
+    }
+    if fetched:
+        cache.set_many(fetched, AUTHOR_RECENT_TIMEOUT)
+        cached.update(fetched)
+    return list(cached.values())
+
+
+def forget_recent(author_id):
+    cache.delete(recent_key(author_id))
+
+
+class MergedFeed(EntryFeed):
+    """Fan-out on read: лента как k-way слияние списков авторов."""
+
+    @classmethod
+    def for_authors(cls, author_ids, limit=TIMELINE_LENGTH):
+        merged = heapq.merge(*author_recent(author_ids), reverse=True)
+        return cls(list(islice(merged, limit)))
+
+
+class TimelineFeed:
+    """Лента подписок из Timeline для Paginator.
+
+    Страница — срез строк Timeline читателя по индексу
+    timeline_user_feed_idx, без сортировки соединения с Post; сами
+    посты берутся из кэша карточек (get_cards).
+    """
+    ordered = True
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def for_user(cls, user):
+        return cls(Timeline.objects.filter(user=user).order_by(
+            '-pub_date', '-post_id'
+        ))
+
+    def order_by(self, *fields):
+        # Строки уже идут в порядке FEED_ORDERING
+        return self
+
+    def count(self):
+        return self.rows.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        return get_cards(list(
+            self.rows.values_list('pub_date', 'post_id')[index]
+        ))
+
+    def older(self, pub_date, pk):
+        return TimelineFeed(self.rows.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, post_id__lt=pk)
+        ))
+
+    def newer(self, pub_date, pk):
+        return TimelineFeed(self.rows.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, post_id__gt=pk)
+        ).reverse())
+
+
+def use_merged_feed(author_ids):
+    """Выбирает движок ленты подписок по подпискам читателя."""
+    return (
+        len(author_ids) >= HEAVY_FOLLOWING
+        or not author_ids.isdisjoint(celebrity_ids())
+    )
+
+
+def feed(user):
+    """Посты ленты подписок: из Timeline или слиянием при чтении."""
+    author_ids = set(Follow.objects.filter(
+        user=user
+    ).values_list('author_id', flat=True))
+    if use_merged_feed(author_ids):
+        return MergedFeed.for_authors(author_ids)
+    return TimelineFeed.for_user(user)
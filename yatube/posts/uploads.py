@@ -0,0 +1,164 @@
+"""Приём картинок постов: проверка, нормализация и варианты размеров.
+
+Форма проверяет загрузку по заголовку файла — формат и число пикселей,
+не декодируя картинку, — и приводит её к разумному виду: не больше
+MAX_EDGE по длинной стороне, с учётом EXIF-поворота, без EXIF и XMP.
+Фоновая задача превью (posts.thumbnails) затем сохраняет рядом с
+оригиналом варианты ширин VARIANT_WIDTHS в WebP и JPEG для srcset.
+"""
+import os
+import re
+from io import BytesIO
+
+from django import forms
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps, features
+
+from core.storage import save_in_place
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Больше — почти наверняка «бомба»: 40 Мп хватит любой камере телефона
+MAX_PIXELS = 40_000_000
+MAX_EDGE = 2048
+# Без них картинка выглядит так же; ICC-профиль оставляем ради цвета
+METADATA = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+
+VARIANT_WIDTHS = (480, 960, 1440)
+VARIANT_RE = re.compile(r'^(.+)\.\d+w\.[a-z]+$')
+# расширение, формат Pillow, MIME-тип, опции; первый — предпочтительный
+VARIANT_FORMATS = tuple(variant for variant in (
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', 'image/jpeg', {
+        'quality': 82, 'optimize': True, 'progressive': True
+    }),
+) if variant[1] != 'WEBP' or features.check('webp'))
+
+
+def check(image):
+    """Проверяет формат и размер по заголовку, не декодируя пиксели."""
+    if image.format not in ALLOWED_FORMATS:
+        raise forms.ValidationError(
+            f'Формат {image.format} не поддерживается'
+        )
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise forms.ValidationError(
+            f'Слишком большая картинка: {width}x{height}'
+        )
+
+
+def normalize(upload):
+    """Загрузка с картинкой не больше MAX_EDGE и без метаданных.
+
+    Картинку, которую менять не нужно, возвращает как есть, чтобы не
+    пережимать её ещё раз; анимированные GIF тоже не трогает.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        check(image)
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        oriented = image.getexif().get(0x0112, 1) != 1
+        too_big = max(image.size) > MAX_EDGE
+        if not (oriented or too_big or set(METADATA) & set(image.info)):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        icc_profile = image.info.get('icc_profile')
+        if image_format == 'JPEG':
+            # JPEG умеет декодироваться сразу в уменьшенном масштабе
+            image.draft(image.mode, (MAX_EDGE, MAX_EDGE))
+        normalized = ImageOps.exif_transpose(image)
+    for key in METADATA:
+        normalized.info.pop(key, None)
+    normalized.thumbnail((MAX_EDGE, MAX_EDGE), Image.LANCZOS)
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = BytesIO()
+    normalized.save(buffer, format=image_format, **options)
+    return InMemoryUploadedFile(
+        buffer, upload.field_name, upload.name, upload.content_type,
+        buffer.tell(), None
+    )
+
+
+def variant_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{extension}'
+
+
+def variant_root(name):
+    """Имя оригинала без расширения, если name — вариант; иначе None."""
+    match = VARIANT_RE.match(name)
+    return match.group(1) if match else None
+
+
+def variant_widths(width):
+    """Ширины вариантов для картинки, самый крупный из которых — width."""
+    return [size for size in VARIANT_WIDTHS if size < width] + [width]
+
+
+def flatten(image):
+    """RGB для JPEG и WebP: прозрачное — на белом фоне."""
+    if image.mode in ('RGBA', 'LA', 'P') and (
+        image.mode != 'P' or 'transparency' in image.info
+    ):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_variants(image, force=False):
+    """Сохраняет варианты картинки; ширина самого крупного или None.
+
+    Имена вариантов выводятся из имени оригинала, поэтому пишутся они
+    как есть, в default_storage, а не через хранилище картинки, которое
+    назвало бы их по хэшу. Запись атомарная и на месте (save_in_place):
+    две задачи для одной картинки не оставят копий с суффиксами.
+    """
+    storage = default_storage
+    try:
+        with image.open('rb'), Image.open(image) as source:
+            if source.format == 'JPEG':
+                largest = max(VARIANT_WIDTHS)
+                source.draft('RGB', (largest, largest))
+            picture = flatten(ImageOps.exif_transpose(source))
+    except (OSError, SuspiciousFileOperation):
+        # Пропавший, битый или лежащий вне MEDIA_ROOT файл: вариантов нет
+        return None
+    widths = variant_widths(min(picture.width, max(VARIANT_WIDTHS)))
+    for width in widths:
+        height = max(1, round(picture.height * width / picture.width))
+        resized = picture.resize((width, height), Image.LANCZOS)
+        for extension, image_format, _, options in VARIANT_FORMATS:
+            name = variant_name(image.name, width, extension)
+            if storage.exists(name) and not force:
+                continue
+            buffer = BytesIO()
+            resized.save(buffer, format=image_format, **options)
+            save_in_place(storage, name, ContentFile(buffer.getvalue()))
+    return widths[-1]
+
+
+def srcsets(image, width):
+    """[(MIME-тип, srcset)] вариантов картинки для <picture>."""
+    sources = []
+    for extension, _, mime, _ in VARIANT_FORMATS:
+        srcset = ', '.join(
+            f'{default_storage.url(variant_name(image.name, size, extension))}'
+            f' {size}w' for size in variant_widths(width)
+        )
+        sources.append((mime, srcset))
+    return sources
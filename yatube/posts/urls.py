@@ -31,6 +31,11 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
          ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -44,12 +49,12 @@ urlpatterns = [
     ),
     path('liked/', views.liked_index, name='liked_index'),
     path(
-        'like/<str:username>/liked/',
+        'posts/<int:post_id>/like/',
         views.post_liked,
         name='post_liked'
     ),
     path(
-        'like<str:username>/unliked/',
+        'posts/<int:post_id>/unlike/',
         views.post_unliked,
         name='post_unliked'
     ),
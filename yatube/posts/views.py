@@ -1,73 +1,113 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import redirect, render, get_object_or_404
-from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
 
 from .models import Post, Group, User, Follow, Like
 from .forms import PostForm, CommentForm
+from .conditional import (
+    conditional_page, detail_scopes, group_scopes, index_scopes,
+    profile_scopes
+)
+from .feed_cache import cached_feed
+from .generations import page_version
+from .paginators import CommentPaginator, FeedPaginator
+from . import thumbnails, timeline
+from .stats import get_stats
 
 QT_POST_PG = 10
+QT_COMMENTS_PG = 20
+
+
+def paginator(request, queryset, scope=None):
+    pagenator = FeedPaginator(queryset, QT_POST_PG, scope=scope)
+    # ?after=/?before= — keyset-навигация, ?page= — обычная по номеру
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        page_obj = pagenator.cursor_page(after=after, before=before)
+    else:
+        page_number = request.GET.get('page')
+        page_obj = pagenator.get_page(page_number)
+    thumbnails.defer_prefetch(request, page_obj)
+    return page_obj
 
 
-def paginator(request, queryset):
-    pagenator = Paginator(queryset, QT_POST_PG)
-    page_number = request.GET.get('page')
-    page_obj = pagenator.get_page(page_number)
-    return page_obj
+def comments_page(request, post):
+    pagenator = CommentPaginator(
+        post.comments.select_related('author'), QT_COMMENTS_PG
+    )
+    after = request.GET.get('after')
+    if after:
+        return pagenator.cursor_page(after=after)
+    return pagenator.first_page()
 
 
-@cache_page(1)
+@conditional_page(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = cached_feed('global', Post.objects.for_feed())
+    page_obj = paginator(request, post_list, 'global')
     context = {
-        'page_obj': paginator(request, post_list),
+        'page_obj': page_obj,
+        'feed_version': page_version('global', page_obj),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    scope = f'group:{group.pk}'
+    posts = cached_feed(scope, group.posts.for_feed())
+    page_obj = paginator(request, posts, scope)
     context = {
         'group': group,
-        'page_obj': paginator(request, posts),
+        'page_obj': page_obj,
+        'feed_version': page_version(scope, page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_scopes)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post = author.posts.all()
-    following = (
-        request.user.is_authenticated
-        and author.following.filter(user=request.user).exists()
-    )
-    liking = (
-        request.user.is_authenticated
-        and author.liking.filter(user=request.user).exists()
-    )
+    scope = f'author:{author.pk}'
+    post = cached_feed(scope, author.posts.for_feed())
+    page_obj = paginator(request, post, scope)
     context = {
         'author': author,
-        'page_obj': paginator(request, post),
-        'following': following,
-        'liking': liking,
+        'page_obj': page_obj,
+        'feed_version': page_version(scope, page_obj),
+        'stats': get_stats(author),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    comments = comments_page(request, post)
     context = {
         'post': post,
+        'stats': get_stats(post.author),
         'form': form,
         'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    # Следующая пачка комментариев для кнопки «Показать ещё»
+    post = get_object_or_404(Post, pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     username = request.user.username
@@ -99,6 +139,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -113,14 +154,15 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    post = Post.objects.filter(author__following__user=request.user).all()
+    post = timeline.feed(request.user)
     context = {
-        'page_obj': paginator(request, post),
+        'page_obj': paginator(request, post, f'follow:{request.user.pk}'),
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     # Подписаться на автора
     if request.user.username == username:
@@ -136,6 +178,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     # Дизлайк, отписка
     following = get_object_or_404(User, username=username)
@@ -147,34 +190,31 @@ def profile_unfollow(request, username):
 @login_required
 def liked_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    post = Post.objects.all()
-    like = Post.objects.filter(like__liking__author=request.user).all()
+    post = Post.objects.for_feed().filter(like__user=request.user)
     context = {
-        'page_obj': paginator(request, post),
-        'like': like
+        'page_obj': paginator(request, post, f'liked:{request.user.pk}'),
     }
     return render(request, 'posts/like.html', context)
 
 
 @login_required
-def post_liked(request, username, post_id):
-    # Подписаться на автора
-    like = get_object_or_404(Post, pk=post_id)
-    liking = get_object_or_404(User, username=username)
-    already_like = Like.objects.get_or_create(
+@transaction.atomic
+def post_liked(request, post_id):
+    # Лайкнуть пост
+    post = get_object_or_404(Post, pk=post_id)
+    Like.objects.get_or_create(
         user=request.user,
-        post=like,
-        username=liking,
+        post=post,
+        defaults={'author_id': post.author_id},
     )
-    if not already_like:
-        Like.objects.create(user=request.user, post=like, username=liking,)
-    return redirect("posts:index", pk=post_id)
+    return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@transaction.atomic
 def post_unliked(request, post_id):
-    # Дизлайк, отписка
-    like = get_object_or_404(Post, pk=post_id)
-    liker = get_object_or_404(Like, post=like, user=request.user)
+    # Дизлайк
+    post = get_object_or_404(Post, pk=post_id)
+    liker = get_object_or_404(Like, post=post, user=request.user)
     liker.delete()
-    return redirect("posts:index", pk=post_id)
+    return redirect('posts:post_detail', post_id=post_id)
@@ -54,12 +54,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # До сессий: анонимам готовая страница отдаётся без них
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Общая страница из кэша и части для конкретного зрителя. Ответ из
+    # кэша минует middleware ниже, поэтому заголовки ставятся выше
+    'posts.middleware.PageShellMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -94,9 +99,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Таблица core.CacheEntry: своя база, чтобы запись в кэш не ждала
+    # транзакций приложения и не занимала блокировку основной базы
+    'cache': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'cache.sqlite3'),
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.CacheRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -153,11 +166,27 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
+    # L1 в памяти процесса поверх общего для всех воркеров хранилища
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 30,
+            'SYNC_INTERVAL': 1,
+        },
+    },
+    # Таблица core.CacheEntry в базе 'cache': add и incr атомарны
+    # для всех процессов
+    'shared': {
+        'BACKEND': 'core.cache.DatabaseCache',
+        'LOCATION': 'shared',
+    },
 }
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ] 
+
+# True — задачи очереди выполняются сразу, без manage.py runworker
+JOBS_EAGER = False
@@ -0,0 +1,30 @@
+"""Настройки тестов.
+
+    python manage.py test --settings=yatube.settings_test
+
+pytest берёт их из pytest.ini.
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES
+
+# Тесты не должны видеть кэш прошлых запусков и соседних процессов
+CACHES['shared'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'shared',
+}
+
+# Задачи очереди выполняются сразу, без manage.py runworker
+JOBS_EAGER = True
+
+# База тестов в файле, а не в памяти: у общей in-memory базы SQLite
+# одновременные записи из потоков сразу падают с «table is locked»
+# вместо ожидания, как у настоящей базы
+DATABASES['default']['TEST'] = {
+    'NAME': os.path.join(tempfile.gettempdir(), 'yatube-test.sqlite3'),
+}
+DATABASES['cache']['TEST'] = {
+    'NAME': os.path.join(tempfile.gettempdir(), 'yatube-test-cache.sqlite3'),
+}
@@ -18,6 +18,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import cache_stats, serve_media
+
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.intern_error'
 handler403 = 'core.views.csrf_failure'
@@ -28,11 +30,12 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('cache-stats/', cache_stats, name='cache_stats'),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+        settings.MEDIA_URL, serve_media, document_root=settings.MEDIA_ROOT
     )
 
 if settings.DEBUG: